@@ -4,15 +4,275 @@ Enhanced Agentic Tools for Dextro Solar IoT Platform
 Comprehensive tool set for business intelligence and device monitoring
 """
 
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import os
+import pickle
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+import httpx
+import orjson
 import pandas as pd
 import streamlit as st
+from postgrest.exceptions import APIError as PostgrestAPIError
 from strands import tool
 
+from config import env_bool, env_str
+
 logger = logging.getLogger(__name__)
 
+# =============================================================================
+# RPC RESULT CACHE
+# =============================================================================
+
+RPC_CACHE_MAXSIZE = 256
+RPC_CACHE_TTL_SECONDS = 30
+
+_rpc_cache: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+_rpc_cache_lock = threading.Lock()
+
+# In-flight calls shared by concurrent callers (RPCs and direct table reads)
+_inflight: Dict[Tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Opt-in disk layer so a fresh process (cold Streamlit start) can reuse recent results
+RPC_DISK_CACHE_ENABLED = env_bool("DEXTRO_RPC_DISK_CACHE")
+RPC_DISK_CACHE_DIR = env_str("DEXTRO_RPC_DISK_CACHE_DIR", ".rpc_cache")
+RPC_DISK_CACHE_BUCKET_SECONDS = 60
+
+# Row-returning RPCs that only ever need their worst rows: name -> (order column, limit).
+# PostgREST applies the ORDER BY/LIMIT server-side, so large fleets never ship every row.
+HIGH_ERROR_DEVICES_LIMIT = 100
+RPC_TOP_K: Dict[str, Tuple[str, int]] = {
+    'rpc_high_error_devices': ('error_rate', HIGH_ERROR_DEVICES_LIMIT),
+}
+
+# Outbound RPC throttling - bursts of agent tool calls back off instead of failing on 429/503
+RPC_MAX_CONCURRENCY = 8
+RPC_MAX_ATTEMPTS = 4
+RPC_BACKOFF_INITIAL_SECONDS = 0.2
+RPC_BACKOFF_MAX_SECONDS = 3.0
+_RETRYABLE_STATUS_CODES = {"429", "502", "503", "504"}
+
+_rpc_semaphore = threading.BoundedSemaphore(RPC_MAX_CONCURRENCY)
+
+# Upper bound on rows pulled by get_device_power_data when the caller doesn't narrow the query
+DEVICE_POWER_DATA_LIMIT = 1000
+
+# Short-lived caches for direct table reads (telemetry changes constantly, profiles rarely)
+DEVICE_LOGS_CACHE_TTL_SECONDS = 60
+CUSTOMER_PROFILE_CACHE_TTL_SECONDS = 600
+CUSTOMER_PROFILE_CACHE_MAX_ENTRIES = 4096
+DEVICE_CATALOG_CACHE_TTL_SECONDS = 300
+DEVICE_CATALOG_SAMPLE_SIZE = 50
+DASHBOARD_SNAPSHOT_CACHE_TTL_SECONDS = 60
+
+# Startup prewarm of the argument values the agent asks for most often (off by default
+# so scripts and test runs never hit the production database on import)
+RPC_PREWARM_ENABLED = env_bool("DEXTRO_RPC_PREWARM")
+RPC_PREWARM_DATE_RANGES = (1, 7, 20, 30)
+RPC_PREWARM_CALLS: List[Tuple[str, Optional[Dict[str, Any]]]] = [
+    ('rpc_business_performance_summary', {'p_date_range_days': days}) for days in RPC_PREWARM_DATE_RANGES
+] + [
+    ('rpc_high_error_devices', {'p_error_threshold': 5}),
+]
+
+
+def _rpc_cache_key(name: str, params: Optional[Dict[str, Any]]) -> Tuple:
+    """Build a hashable cache key from an RPC name and its parameters"""
+    return (name, tuple(sorted(params.items())) if params else ())
+
+
+def _disk_cache_path(key: Tuple, bucket: int) -> str:
+    """Path of the disk cache file for a key within a freshness bucket"""
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(RPC_DISK_CACHE_DIR, f"{bucket}-{digest}.pkl")
+
+
+def _disk_cache_load(path: str) -> Tuple[bool, Any]:
+    """Load a cached RPC payload, returning (found, data)"""
+    try:
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+    except FileNotFoundError:
+        return False, None
+    except (OSError, EOFError, pickle.PickleError) as e:
+        logger.warning(f"Ignoring unreadable RPC disk cache entry {path}: {e}")
+        return False, None
+
+
+def _disk_cache_store(path: str, data: Any, bucket: int) -> None:
+    """Atomically write an RPC payload to disk and prune entries from older buckets"""
+    try:
+        os.makedirs(RPC_DISK_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        
+        for filename in os.listdir(RPC_DISK_CACHE_DIR):
+            file_bucket = filename.split("-", 1)[0]
+            if filename.endswith(".pkl") and file_bucket.isdigit() and int(file_bucket) < bucket:
+                os.remove(os.path.join(RPC_DISK_CACHE_DIR, filename))
+    except OSError as e:
+        logger.warning(f"Failed to write RPC disk cache entry {path}: {e}")
+
+
+def _is_retryable_rpc_error(error: Exception) -> bool:
+    """Whether an RPC failure is transient (rate limiting, gateway errors, network)"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, PostgrestAPIError):
+        return str(error.code) in _RETRYABLE_STATUS_CODES or "too many requests" in str(error).lower()
+    return False
+
+
+def _execute_rpc(name: str, params: Optional[Dict[str, Any]]) -> Any:
+    """Execute an RPC against Supabase, applying any server-side top-K limit for it"""
+    from ai_agent import supabase_manager
+    
+    query = supabase_manager.client.rpc(name, params or {})
+    if name in RPC_TOP_K:
+        order_column, limit = RPC_TOP_K[name]
+        query = query.order(order_column, desc=True).limit(limit)
+    
+    for attempt in range(1, RPC_MAX_ATTEMPTS + 1):
+        try:
+            with _rpc_semaphore:
+                return query.execute().data
+        except Exception as e:
+            if attempt == RPC_MAX_ATTEMPTS or not _is_retryable_rpc_error(e):
+                raise
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(RPC_BACKOFF_MAX_SECONDS, RPC_BACKOFF_INITIAL_SECONDS * 2 ** (attempt - 1)))
+            logger.warning(f"RPC {name} failed ({e}) - retrying in {delay:.2f}s (attempt {attempt}/{RPC_MAX_ATTEMPTS})")
+            time.sleep(delay)
+
+
+def _fetch_rpc(name: str, params: Optional[Dict[str, Any]], key: Tuple) -> Any:
+    """Execute an RPC, going through the disk cache when DEXTRO_RPC_DISK_CACHE=1"""
+    if not RPC_DISK_CACHE_ENABLED:
+        return _execute_rpc(name, params)
+    
+    bucket = int(time.time() // RPC_DISK_CACHE_BUCKET_SECONDS)
+    path = _disk_cache_path(key, bucket)
+    found, data = _disk_cache_load(path)
+    if found:
+        logger.info(f"RPC disk cache hit for {name}")
+        return data
+    
+    data = _execute_rpc(name, params)
+    _disk_cache_store(path, data, bucket)
+    return data
+
+
+def _single_flight(key: Tuple, fn: Callable[[], Any]) -> Any:
+    """
+    Run fn for a key, coalescing concurrent calls: while one caller is executing,
+    others with the same key wait for and share its result (or exception).
+    """
+    with _inflight_lock:
+        inflight = _inflight.get(key)
+        if inflight is None:
+            _inflight[key] = future = Future()
+    
+    if inflight is not None:
+        logger.info(f"Waiting on in-flight call for {key[0]}")
+        return inflight.result()
+    
+    try:
+        result = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def _cached_rpc(name: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Call a Supabase RPC function, serving repeat calls from an in-process LRU+TTL cache.
+    
+    Only successful responses are cached - exceptions propagate to the caller so
+    transient failures are retried on the next call. Concurrent misses for the same
+    key are coalesced: one caller executes the RPC and the others wait for its result.
+    
+    Returns:
+        The `data` payload of the RPC response
+    """
+    key = _rpc_cache_key(name, params)
+    now = time.monotonic()
+    
+    with _rpc_cache_lock:
+        entry = _rpc_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _rpc_cache.move_to_end(key)
+            logger.info(f"RPC cache hit for {name}")
+            return entry[1]
+    
+    def fetch_and_store():
+        data = _fetch_rpc(name, params, key)
+        with _rpc_cache_lock:
+            _rpc_cache[key] = (now + RPC_CACHE_TTL_SECONDS, data)
+            _rpc_cache.move_to_end(key)
+            while len(_rpc_cache) > RPC_CACHE_MAXSIZE:
+                _rpc_cache.popitem(last=False)
+        return data
+    
+    return _single_flight(key, fetch_and_store)
+
+
+def _prefetch_rpcs(calls: List[Tuple[str, Optional[Dict[str, Any]]]]) -> None:
+    """Warm the RPC cache by issuing independent RPC calls concurrently"""
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [(name, params, executor.submit(_cached_rpc, name, params)) for name, params in calls]
+    
+    for name, params, future in futures:
+        if future.exception() is not None:
+            logger.warning(f"Prefetch of {name} {params or ''} failed: {future.exception()}")
+
+
+def start_rpc_prewarm() -> Optional[threading.Thread]:
+    """Warm the RPC cache for the most common tool arguments in a background thread"""
+    if not RPC_PREWARM_ENABLED:
+        return None
+    
+    thread = threading.Thread(target=_prefetch_rpcs, args=(RPC_PREWARM_CALLS,), name="rpc-prewarm", daemon=True)
+    thread.start()
+    logger.info(f"Prewarming RPC cache with {len(RPC_PREWARM_CALLS)} calls")
+    return thread
+
+
+def _payload_digest(*parts: Any) -> str:
+    """Stable content hash of RPC payloads, used to skip rebuilding unchanged session data"""
+    encoded = orjson.dumps(
+        parts,
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _index_metrics(frame: pd.DataFrame, columns: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """Pivot TABLE-format metric rows into {metric_name: {renamed column: value}}"""
+    return (
+        frame.drop_duplicates('metric_name', keep='last')
+        .set_index('metric_name')[list(columns)]
+        .rename(columns=columns)
+        .to_dict('index')
+    )
+
+
 # =============================================================================
 # BUSINESS INTELLIGENCE TOOLS (Custom RPC Functions)
 # =============================================================================
@@ -36,7 +296,7 @@ def get_business_performance_summary(date_range_days: int = 20) -> Dict[str, Any
         
     Supabase RPC Function: rpc_business_performance_summary
     """
-    from ai_agent import supabase_manager
+    ss = getattr(st, 'session_state', None)
     
     try:
         logger.info(f"Fetching business performance summary for {date_range_days} days")
@@ -48,23 +308,16 @@ def get_business_performance_summary(date_range_days: int = 20) -> Dict[str, Any
         
         # Call custom RPC function for complex business calculations
         logger.info("Making RPC call to rpc_business_performance_summary")
-        result = supabase_manager.client.rpc(
-            'rpc_business_performance_summary',
-            params
-        ).execute()
+        rows = _cached_rpc('rpc_business_performance_summary', params)
         
-        logger.info(f"RPC Response status: {result}")
-        logger.info(f"RPC Response data length: {len(result.data) if result.data else 0}")
+        logger.info(f"RPC Response data length: {len(rows) if rows else 0}")
         
-        if result.data and len(result.data) > 0:
+        if rows:
             # Convert TABLE format to dictionary for easy access
-            metrics = {}
-            for row in result.data:
-                metrics[row['metric_name']] = {
-                    'value': row['metric_value'],
-                    'description': row['metric_description'],
-                    'info': row['additional_info']
-                }
+            metrics = _index_metrics(
+                pd.DataFrame(rows, dtype=object),
+                {'metric_value': 'value', 'metric_description': 'description', 'additional_info': 'info'}
+            )
             
             # Extract key values
             new_devices = int(metrics.get('new_devices_installed', {}).get('value', 0))
@@ -101,10 +354,8 @@ def get_business_performance_summary(date_range_days: int = 20) -> Dict[str, Any
             }
             
             # Store in Streamlit session state for display
-            if hasattr(st, 'session_state'):
-                if 'business_performance_data' not in st.session_state:
-                    st.session_state.business_performance_data = {}
-                st.session_state.business_performance_data = response_data
+            if ss is not None:
+                ss.business_performance_data = response_data
                 logger.info("Stored business performance data in Streamlit session state")
             
             return response_data
@@ -126,8 +377,8 @@ def get_business_performance_summary(date_range_days: int = 20) -> Dict[str, Any
             error_response["help"] = "Check your RPC function - some columns might need explicit casting from text to integer"
         
         # Store error in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.business_performance_error = error_response
+        if ss is not None:
+            ss.business_performance_error = error_response
         
         return error_response
 
@@ -143,47 +394,47 @@ def get_fleet_health_overview() -> Dict[str, Any]:
     Returns:
         Dict containing comprehensive fleet health data
         
-    Supabase RPC Function: rpc_fleet_health_overview
+    Supabase RPC Function: rpc_fleet_health_overview (optional 'recommendations' category rows)
     """
-    from ai_agent import supabase_manager
+    ss = getattr(st, 'session_state', None)
     
     try:
         logger.info("Fetching comprehensive fleet health overview")
         
-        result = supabase_manager.client.rpc('rpc_fleet_health_overview').execute()
+        rows = _cached_rpc('rpc_fleet_health_overview')
         
-        if result.data and len(result.data) > 0:
+        if rows:
+            # Identical payload already processed - reuse the stored result and skip re-rendering
+            digest = _payload_digest(rows)
+            if ss is not None and ss.get('_fleet_health_hash') == digest \
+                    and 'fleet_health_data' in ss:
+                logger.info("Fleet health payload unchanged - reusing session state")
+                return ss.fleet_health_data
+            
             # Process TABLE format results by category
-            fleet_summary = {}
-            performance_metrics = {}
-            error_distribution = {}
-            geographic_health = {}
+            health_df = pd.DataFrame(rows, dtype=object)
+            health_df['metric_value'] = pd.to_numeric(health_df['metric_value']).fillna(0).astype(float)
+            categories = dict(tuple(health_df.groupby('health_category', sort=False)))
+            empty = health_df.iloc[0:0]
             
-            for row in result.data:
-                category = row['health_category']
-                
-                if category == 'fleet_summary':
-                    fleet_summary[row['metric_name']] = {
-                        'value': float(row['metric_value']) if row['metric_value'] is not None else 0,
-                        'unit': row['metric_unit'],
-                        'description': row['status_description']
-                    }
-                elif category == 'performance':
-                    performance_metrics[row['metric_name']] = {
-                        'value': float(row['metric_value']) if row['metric_value'] is not None else 0,
-                        'unit': row['metric_unit'],
-                        'description': row['status_description']
-                    }
-                elif category == 'error_distribution':
-                    error_distribution[row['metric_name']] = {
-                        'count': int(row['metric_value']) if row['metric_value'] is not None else 0,
-                        'description': row['status_description']
-                    }
-                elif category == 'geographic_health':
-                    geographic_health[row['metric_name']] = {
-                        'health_score': float(row['metric_value']) if row['metric_value'] is not None else 0,
-                        'description': row['status_description']
-                    }
+            metric_columns = {'metric_value': 'value', 'metric_unit': 'unit', 'status_description': 'description'}
+            fleet_summary = _index_metrics(categories.get('fleet_summary', empty), metric_columns)
+            performance_metrics = _index_metrics(categories.get('performance', empty), metric_columns)
+            error_distribution = _index_metrics(
+                categories.get('error_distribution', empty).astype({'metric_value': int}),
+                {'metric_value': 'count', 'status_description': 'description'}
+            )
+            geographic_health = _index_metrics(
+                categories.get('geographic_health', empty),
+                {'metric_value': 'health_score', 'status_description': 'description'}
+            )
+            
+            # Prefer recommendations computed by the RPC; older RPC versions don't return them
+            server_recommendations = categories.get('recommendations', empty)['status_description'].dropna()
+            if not server_recommendations.empty:
+                recommendations = server_recommendations.tolist()
+            else:
+                recommendations = _generate_fleet_recommendations(fleet_summary, performance_metrics, error_distribution)
             
             response_data = {
                 "success": True,
@@ -204,15 +455,15 @@ def get_fleet_health_overview() -> Dict[str, Any]:
                     "geographic_health": geographic_health
                 },
                 "health_score": _calculate_overall_health_score(fleet_summary, error_distribution),
-                "recommendations": _generate_fleet_recommendations(fleet_summary, performance_metrics, error_distribution)
+                "recommendations": recommendations
             }
             
             # Store in Streamlit session state
-            if hasattr(st, 'session_state'):
-                st.session_state.fleet_health_data = response_data
+            if ss is not None:
+                ss.fleet_health_data = response_data
                 
                 # Create dashboard metrics
-                st.session_state.fleet_dashboard_metrics = {
+                ss.fleet_dashboard_metrics = {
                     "total_devices": int(fleet_summary.get('total_devices', {}).get('value', 0)),
                     "operational_rate": float(fleet_summary.get('uptime_percent', {}).get('value', 0)),
                     "water_production": float(performance_metrics.get('water_production', {}).get('value', 0)),
@@ -229,8 +480,9 @@ def get_fleet_health_overview() -> Dict[str, Any]:
                             "Health Score": f"{data['health_score']:.1f}%",
                             "Status": "Healthy" if data['health_score'] > 80 else "Needs Attention"
                         })
-                    st.session_state.geographic_health_df = pd.DataFrame(geo_health_list)
+                    ss.geographic_health_df = pd.DataFrame(geo_health_list)
                 
+                ss._fleet_health_hash = digest
                 logger.info("Stored comprehensive fleet health data in session state")
             
             return response_data
@@ -238,9 +490,10 @@ def get_fleet_health_overview() -> Dict[str, Any]:
         no_data_response = {"success": True, "message": "No fleet health data available"}
         
         # Store empty result in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.fleet_health_data = no_data_response
-            st.session_state.fleet_dashboard_metrics = {"status": "no_data"}
+        if ss is not None:
+            ss.fleet_health_data = no_data_response
+            ss.fleet_dashboard_metrics = {"status": "no_data"}
+            ss.pop('_fleet_health_hash', None)
             
         return no_data_response
         
@@ -249,30 +502,76 @@ def get_fleet_health_overview() -> Dict[str, Any]:
         error_response = {"success": False, "error": str(e)}
         
         # Store error in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.fleet_health_error = error_response
+        if ss is not None:
+            ss.fleet_health_error = error_response
             
         return error_response
 
+# Recommendation flags produced by _fleet_recommendation_flags, in display order
+REC_CRITICAL_ERRORS = 1
+REC_WARNING_ERRORS = 2
+REC_MONITOR_ERRORS = 4
+REC_HIGH_TEMPERATURE = 8
+REC_LOW_TEMPERATURE = 16
+REC_LOW_UPTIME = 32
+REC_HIGH_UPTIME = 64
+
+_FLEET_RECOMMENDATIONS = (
+    (REC_CRITICAL_ERRORS, "🔴 CRITICAL: High error rate detected - Schedule immediate fleet inspection"),
+    (REC_WARNING_ERRORS, "🟡 WARNING: Multiple devices showing errors - Plan maintenance cycle"),
+    (REC_MONITOR_ERRORS, "✅ Monitor error devices and address during next maintenance window"),
+    (REC_HIGH_TEMPERATURE, "🌡️ High average temperature detected - Check cooling systems and clean air filters"),
+    (REC_LOW_TEMPERATURE, "❄️ Low temperature readings - Verify sensors and check for winter operational issues"),
+    (REC_LOW_UPTIME, "⚡ Low fleet uptime - Investigate power supply and connectivity issues"),
+    (REC_HIGH_UPTIME, "✅ Excellent fleet uptime - Continue current maintenance practices"),
+)
+
+
+def _fleet_health_score(total_devices: float, active_devices: float, error_devices: float) -> float:
+    """Fleet health score (0-100): 60% weight on active devices, +40 with no errors, otherwise +10 minus a 30% error penalty"""
+    if error_devices == 0:
+        score = 40
+    else:
+        error_rate = (error_devices / total_devices) * 100 if total_devices > 0 else 0
+        score = 10 - error_rate * 0.3
+    if total_devices > 0:
+        score += (active_devices / total_devices) * 60
+    return round(max(0, min(100, score)), 1)
+
+def _fleet_recommendation_flags(total_devices: float, error_devices: float, avg_temp: float, uptime: float) -> int:
+    """Bitmask of the fleet recommendations that apply"""
+    flags = 0
+    if error_devices > 0:
+        error_rate = (error_devices / total_devices) * 100 if total_devices > 0 else 0
+        if error_rate > 20:
+            flags |= REC_CRITICAL_ERRORS
+        elif error_rate > 10:
+            flags |= REC_WARNING_ERRORS
+        else:
+            flags |= REC_MONITOR_ERRORS
+    
+    if avg_temp > 60:
+        flags |= REC_HIGH_TEMPERATURE
+    elif avg_temp < 20:
+        flags |= REC_LOW_TEMPERATURE
+    
+    if uptime < 90:
+        flags |= REC_LOW_UPTIME
+    elif uptime > 95:
+        flags |= REC_HIGH_UPTIME
+    
+    return flags
+
 def _calculate_overall_health_score(fleet_summary: Dict, error_distribution: Dict) -> float:
-    """Calculate overall fleet health score from 0-100"""
+    """Calculate overall fleet health score from 0-100 (metric values are already numeric)"""
     try:
-        total_devices = fleet_summary.get('total_devices', {}).get('value', 1)
-        active_devices = fleet_summary.get('active_devices', {}).get('value', 0)
-        error_devices = fleet_summary.get('error_devices', {}).get('value', 0)
-        
-        # Base score from active devices percentage
-        active_score = (active_devices / total_devices) * 60 if total_devices > 0 else 0
-        
-        # Penalty for error devices
-        error_penalty = (error_devices / total_devices) * 30 if total_devices > 0 else 0
-        
-        # Bonus for no errors
-        no_error_bonus = 40 if error_devices == 0 else 10
-        
-        overall_score = max(0, min(100, active_score - error_penalty + no_error_bonus))
-        return round(overall_score, 1)
-    except:
+        return _fleet_health_score(
+            float(fleet_summary.get('total_devices', {}).get('value', 1)),
+            float(fleet_summary.get('active_devices', {}).get('value', 0)),
+            float(fleet_summary.get('error_devices', {}).get('value', 0))
+        )
+    except Exception as e:
+        logger.error(f"Error calculating fleet health score: {e}")
         return 50.0  # Default neutral score
 
 def _generate_fleet_recommendations(fleet_summary: Dict, performance_metrics: Dict, error_distribution: Dict) -> List[str]:
@@ -280,32 +579,13 @@ def _generate_fleet_recommendations(fleet_summary: Dict, performance_metrics: Di
     recommendations = []
     
     try:
-        total_devices = fleet_summary.get('total_devices', {}).get('value', 0)
-        error_devices = fleet_summary.get('error_devices', {}).get('value', 0)
-        avg_temp = performance_metrics.get('temperature', {}).get('value', 0)
-        uptime = fleet_summary.get('uptime_percent', {}).get('value', 100)
-        
-        # Error-based recommendations
-        if error_devices > 0:
-            error_rate = (error_devices / total_devices) * 100 if total_devices > 0 else 0
-            if error_rate > 20:
-                recommendations.append("🔴 CRITICAL: High error rate detected - Schedule immediate fleet inspection")
-            elif error_rate > 10:
-                recommendations.append("🟡 WARNING: Multiple devices showing errors - Plan maintenance cycle")
-            else:
-                recommendations.append("✅ Monitor error devices and address during next maintenance window")
-        
-        # Temperature-based recommendations
-        if avg_temp > 60:
-            recommendations.append("🌡️ High average temperature detected - Check cooling systems and clean air filters")
-        elif avg_temp < 20:
-            recommendations.append("❄️ Low temperature readings - Verify sensors and check for winter operational issues")
-        
-        # Uptime-based recommendations
-        if uptime < 90:
-            recommendations.append("⚡ Low fleet uptime - Investigate power supply and connectivity issues")
-        elif uptime > 95:
-            recommendations.append("✅ Excellent fleet uptime - Continue current maintenance practices")
+        flags = _fleet_recommendation_flags(
+            float(fleet_summary.get('total_devices', {}).get('value', 0)),
+            float(fleet_summary.get('error_devices', {}).get('value', 0)),
+            float(performance_metrics.get('temperature', {}).get('value', 0)),
+            float(fleet_summary.get('uptime_percent', {}).get('value', 100))
+        )
+        recommendations = [text for flag, text in _FLEET_RECOMMENDATIONS if flags & flag]
         
         # Default recommendation if no issues
         if not recommendations:
@@ -318,6 +598,17 @@ def _generate_fleet_recommendations(fleet_summary: Dict, performance_metrics: Di
     return recommendations
 
 
+_CRITICAL_ISSUE_COLUMNS = {
+    'priority_rank': 'priority',
+    'issue_type': 'type',
+    'severity_level': 'severity',
+    'affected_devices': 'affected_devices',
+    'description': 'description',
+    'recommendation': 'recommendation',
+    'business_impact': 'business_impact'
+}
+
+
 @tool
 def get_critical_issues_analysis() -> Dict[str, Any]:
     """
@@ -329,49 +620,52 @@ def get_critical_issues_analysis() -> Dict[str, Any]:
     Returns:
         Dict containing prioritized critical issues
         
-    Supabase RPC Function: rpc_critical_issues_analysis
+    Supabase RPC Function: rpc_critical_issues_analysis (jsonb {issues, total_affected} or TABLE rows)
     """
-    from ai_agent import supabase_manager
+    ss = getattr(st, 'session_state', None)
     
     try:
         logger.info("Analyzing critical issues across the fleet")
         
-        result = supabase_manager.client.rpc('rpc_critical_issues_analysis').execute()
-        
-        if result.data and len(result.data) > 0:
-            # Convert TABLE format to structured issues list
+        payload = _cached_rpc('rpc_critical_issues_analysis')
+        
+        if isinstance(payload, dict):
+            # jsonb payload - issues arrive already in final shape
+            critical_issues = payload.get('issues') or []
+            total_affected_devices = payload.get('total_affected') or 0
+            issues_df = pd.DataFrame(critical_issues, dtype=object)
+        elif payload:
+            # Convert TABLE format to structured issues list, in the order the RPC returns them
+            issues_df = (
+                pd.DataFrame(payload, dtype=object)
+                .rename(columns=_CRITICAL_ISSUE_COLUMNS)[list(_CRITICAL_ISSUE_COLUMNS.values())]
+            )
+            critical_issues = issues_df.to_dict('records')
+            total_affected_devices = int(pd.to_numeric(issues_df['affected_devices']).sum())
+        else:
             critical_issues = []
-            for row in result.data:
-                issue = {
-                    "priority": row['priority_rank'],
-                    "type": row['issue_type'],
-                    "severity": row['severity_level'],
-                    "affected_devices": row['affected_devices'],
-                    "description": row['description'],
-                    "recommendation": row['recommendation'],
-                    "business_impact": row['business_impact']
-                }
-                critical_issues.append(issue)
-            
+        
+        if critical_issues:
             response_data = {
                 "success": True,
                 "critical_issues": critical_issues,
                 "summary": f"Found {len(critical_issues)} critical issues requiring attention",
                 "highest_priority": critical_issues[0] if critical_issues else None,
-                "total_affected_devices": sum(issue['affected_devices'] for issue in critical_issues)
+                "total_affected_devices": total_affected_devices
             }
             
             # Store in Streamlit session state
-            if hasattr(st, 'session_state'):
-                st.session_state.critical_issues_data = response_data
+            if ss is not None:
+                ss.critical_issues_data = response_data
                 
                 # Create a summary for quick access
-                st.session_state.critical_issues_summary = {
+                severity_counts = issues_df['severity'].value_counts()
+                ss.critical_issues_summary = {
                     "total_issues": len(critical_issues),
-                    "critical_count": sum(1 for issue in critical_issues if issue['severity'] == 'Critical'),
-                    "high_count": sum(1 for issue in critical_issues if issue['severity'] == 'High'),
-                    "medium_count": sum(1 for issue in critical_issues if issue['severity'] == 'Medium'),
-                    "total_devices_affected": sum(issue['affected_devices'] for issue in critical_issues)
+                    "critical_count": int(severity_counts.get('Critical', 0)),
+                    "high_count": int(severity_counts.get('High', 0)),
+                    "medium_count": int(severity_counts.get('Medium', 0)),
+                    "total_devices_affected": total_affected_devices
                 }
                 logger.info(f"Stored {len(critical_issues)} critical issues in session state")
             
@@ -380,9 +674,9 @@ def get_critical_issues_analysis() -> Dict[str, Any]:
         no_issues_response = {"success": True, "critical_issues": [], "message": "No critical issues detected"}
         
         # Store in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.critical_issues_data = no_issues_response
-            st.session_state.critical_issues_summary = {"total_issues": 0, "status": "healthy"}
+        if ss is not None:
+            ss.critical_issues_data = no_issues_response
+            ss.critical_issues_summary = {"total_issues": 0, "status": "healthy"}
             
         return no_issues_response
         
@@ -391,17 +685,36 @@ def get_critical_issues_analysis() -> Dict[str, Any]:
         error_response = {"success": False, "error": str(e)}
         
         # Store error in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.critical_issues_error = error_response
+        if ss is not None:
+            ss.critical_issues_error = error_response
             
         return error_response
 
 
+_HIGH_ERROR_DEVICE_COLUMNS = [
+    'device_id', 'location', 'district', 'error_count', 'total_readings',
+    'error_rate_percent', 'last_error_date', 'dominant_error_code', 'current_status'
+]
+
+_HIGH_ERROR_DISPLAY_COLUMNS = {
+    'device_id': 'Device ID',
+    'location': 'Location',
+    'district': 'District',
+    'error_count': 'Error Count',
+    'error_rate_percent': 'Error Rate %',
+    'last_error_date': 'Last Error',
+    'current_status': 'Status',
+    'dominant_error_code': 'Dominant Error'
+}
+
+
 @tool
 def get_high_error_devices(error_threshold: int = 5) -> Dict[str, Any]:
     """
     Identify devices with highest error rates needing immediate attention.
     
+    Only the HIGH_ERROR_DEVICES_LIMIT devices with the highest error rate are fetched.
+    
     Args:
         error_threshold: Minimum number of errors to flag a device (default: 5)
         
@@ -410,7 +723,7 @@ def get_high_error_devices(error_threshold: int = 5) -> Dict[str, Any]:
         
     Supabase RPC Function: rpc_high_error_devices
     """
-    from ai_agent import supabase_manager
+    ss = getattr(st, 'session_state', None)
     
     try:
         logger.info(f"Analyzing high error devices with threshold: {error_threshold}")
@@ -420,32 +733,34 @@ def get_high_error_devices(error_threshold: int = 5) -> Dict[str, Any]:
         logger.info(f"RPC Parameters: {params}")
         logger.info(f"Parameter types: {[(k, type(v).__name__) for k, v in params.items()]}")
         
-        result = supabase_manager.client.rpc(
-            'rpc_high_error_devices',
-            params
-        ).execute()
+        rows = _cached_rpc('rpc_high_error_devices', params)
         
-        logger.info(f"RPC Response data length: {len(result.data) if result.data else 0}")
+        logger.info(f"RPC Response data length: {len(rows) if rows else 0}")
         
-        if result.data and len(result.data) > 0:
+        if rows:
+            # Identical payload already processed - reuse the stored result and skip re-rendering
+            digest = _payload_digest(params, rows)
+            if ss is not None and ss.get('_he_devices_hash') == digest \
+                    and 'high_error_devices_data' in ss:
+                logger.info("High error devices payload unchanged - reusing session state")
+                return ss.high_error_devices_data
+            
             # Convert TABLE format to structured device list
-            high_error_devices = []
-            for row in result.data:
-                device = {
-                    "device_id": str(row['device_id']),
-                    "location": row['location'],
-                    "district": row['district'],
-                    "error_count": int(row['error_count']),
-                    "total_readings": int(row['total_readings']),
-                    "error_rate_percent": float(row['error_rate']),
-                    "last_error_date": row['last_error_date'],
-                    "dominant_error_code": int(row['dominant_error_code']) if row['dominant_error_code'] else None,
-                    "current_status": row['current_status']
-                }
-                high_error_devices.append(device)
+            devices_df = pd.DataFrame(rows, dtype=object).rename(columns={'error_rate': 'error_rate_percent'})
+            devices_df = devices_df.astype({
+                'device_id': str,
+                'error_count': int,
+                'total_readings': int,
+                'error_rate_percent': float
+            })
+            error_codes = pd.to_numeric(devices_df['dominant_error_code'])
+            devices_df['dominant_error_code'] = (
+                error_codes.astype('Int64').astype(object).where(error_codes.fillna(0) != 0, None)
+            )
             
             # Sort by error rate (highest first)
-            high_error_devices.sort(key=lambda x: x['error_rate_percent'], reverse=True)
+            devices_df = devices_df.sort_values('error_rate_percent', ascending=False, kind='stable')
+            high_error_devices = devices_df[_HIGH_ERROR_DEVICE_COLUMNS].to_dict('records')
             
             response_data = {
                 "success": True,
@@ -457,37 +772,27 @@ def get_high_error_devices(error_threshold: int = 5) -> Dict[str, Any]:
             }
             
             # Store in Streamlit session state
-            if hasattr(st, 'session_state'):
-                st.session_state.high_error_devices_data = response_data
+            if ss is not None:
+                ss.high_error_devices_data = response_data
                 
                 # Create DataFrame for table display
-                if high_error_devices:
-                    error_devices_df = pd.DataFrame([
-                        {
-                            "Device ID": device["device_id"],
-                            "Location": device["location"],
-                            "District": device["district"],
-                            "Error Count": device["error_count"],
-                            "Error Rate %": f"{device['error_rate_percent']:.1f}%",
-                            "Last Error": device["last_error_date"],
-                            "Status": device["current_status"],
-                            "Dominant Error": device["dominant_error_code"]
-                        }
-                        for device in high_error_devices
-                    ])
-                    st.session_state.high_error_devices_df = error_devices_df
+                display_df = devices_df[list(_HIGH_ERROR_DISPLAY_COLUMNS)].rename(columns=_HIGH_ERROR_DISPLAY_COLUMNS)
+                display_df['Error Rate %'] = display_df['Error Rate %'].map('{:.1f}%'.format)
+                ss.high_error_devices_df = display_df.reset_index(drop=True)
                     
                 # Create priority alerts for Streamlit UI
-                critical_devices = [d for d in high_error_devices if d['error_rate_percent'] > 20]
-                high_priority_devices = [d for d in high_error_devices if 10 <= d['error_rate_percent'] <= 20]
+                rates = devices_df['error_rate_percent'].to_numpy()
+                critical_devices = int((rates > 20).sum())
+                high_priority_devices = int(((rates >= 10) & (rates <= 20)).sum())
                 
-                st.session_state.error_device_alerts = {
-                    "critical": len(critical_devices),
-                    "high_priority": len(high_priority_devices),
+                ss.error_device_alerts = {
+                    "critical": critical_devices,
+                    "high_priority": high_priority_devices,
                     "total": len(high_error_devices),
                     "threshold_used": error_threshold
                 }
                 
+                ss._he_devices_hash = digest
                 logger.info(f"Stored {len(high_error_devices)} high error devices in session state")
             
             return response_data
@@ -499,10 +804,11 @@ def get_high_error_devices(error_threshold: int = 5) -> Dict[str, Any]:
         }
         
         # Store empty result in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.high_error_devices_data = no_errors_response
-            st.session_state.high_error_devices_df = pd.DataFrame()
-            st.session_state.error_device_alerts = {"total": 0, "status": "healthy"}
+        if ss is not None:
+            ss.high_error_devices_data = no_errors_response
+            ss.high_error_devices_df = pd.DataFrame()
+            ss.error_device_alerts = {"total": 0, "status": "healthy"}
+            ss.pop('_he_devices_hash', None)
             
         return no_errors_response
         
@@ -511,8 +817,8 @@ def get_high_error_devices(error_threshold: int = 5) -> Dict[str, Any]:
         error_response = {"success": False, "error": str(e)}
         
         # Store error in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.high_error_devices_error = error_response
+        if ss is not None:
+            ss.high_error_devices_error = error_response
             
         return error_response
 
@@ -530,15 +836,15 @@ def analyze_overvoltage_impact() -> Dict[str, Any]:
         
     Supabase RPC Function: rpc_overvoltage_analysis
     """
-    from ai_agent import supabase_manager
+    ss = getattr(st, 'session_state', None)
     
     try:
-        result = supabase_manager.client.rpc('rpc_overvoltage_analysis').execute()
+        rows = _cached_rpc('rpc_overvoltage_analysis')
         
-        if result.data and len(result.data) > 0:
+        if rows:
             # Convert TABLE format to structured analysis
             analysis_data = {}
-            for row in result.data:
+            for row in rows:
                 category = row['analysis_category']
                 if category not in analysis_data:
                     analysis_data[category] = {}
@@ -608,10 +914,165 @@ def analyze_overvoltage_impact() -> Dict[str, Any]:
         logger.error(f"Error analyzing overvoltage impact: {e}")
         return {"success": False, "error": str(e)}
 
+
+@tool
+def get_dashboard_overview(date_range_days: int = 20, error_threshold: int = 5) -> Dict[str, Any]:
+    """
+    Get every business intelligence report in a single call.
+    
+    Fetches the business performance, fleet health, critical issues, high error device
+    and overvoltage data concurrently, so a full dashboard refresh costs one round trip
+    instead of five sequential ones.
+    
+    Args:
+        date_range_days: Number of days to analyze for business performance (default: 20)
+        error_threshold: Minimum number of errors to flag a device (default: 5)
+        
+    Returns:
+        Dict containing the result of each business intelligence tool
+    """
+    logger.info("Fetching dashboard overview")
+    
+    _prefetch_rpcs([
+        ('rpc_business_performance_summary', {'p_date_range_days': date_range_days}),
+        ('rpc_fleet_health_overview', None),
+        ('rpc_critical_issues_analysis', None),
+        ('rpc_high_error_devices', {'p_error_threshold': error_threshold}),
+        ('rpc_overvoltage_analysis', None),
+    ])
+    
+    # Every RPC is now cached, so the individual tools only parse and store results
+    return {
+        "success": True,
+        "business_performance": get_business_performance_summary(date_range_days),
+        "fleet_health": get_fleet_health_overview(),
+        "critical_issues": get_critical_issues_analysis(),
+        "high_error_devices": get_high_error_devices(error_threshold),
+        "overvoltage_analysis": analyze_overvoltage_impact()
+    }
+
+@st.cache_data(ttl=DASHBOARD_SNAPSHOT_CACHE_TTL_SECONDS, show_spinner=False)
+def _fetch_dashboard_snapshot() -> List[Dict[str, Any]]:
+    """Read the single precomputed row of mv_dashboard_metrics"""
+    from ai_agent import supabase_manager
+    
+    return _single_flight(
+        ("mv_dashboard_metrics",),
+        lambda: supabase_manager.client.table("mv_dashboard_metrics").select("*").limit(1).execute().data
+    )
+
+
+@tool
+def get_dashboard_snapshot() -> Dict[str, Any]:
+    """
+    Get the headline fleet metrics for the last 24 hours in one lightweight read.
+    
+    The metrics are precomputed by the mv_dashboard_metrics materialized view
+    (refreshed every few minutes), so this is the cheapest way to answer
+    "how is the fleet doing right now" questions.
+    
+    Returns:
+        Dict containing total devices, error devices, water produced, energy used,
+        energy efficiency (litres per kWh), top location and top district
+    """
+    logger.info("Fetching dashboard snapshot")
+    
+    try:
+        rows = _fetch_dashboard_snapshot()
+        
+        if not rows:
+            return {
+                "success": False,
+                "error": "mv_dashboard_metrics is empty",
+                "recommendation": "Refresh the mv_dashboard_metrics materialized view"
+            }
+        
+        snapshot = rows[0]
+        
+        if hasattr(st, 'session_state'):
+            st.session_state.dashboard_snapshot = snapshot
+        
+        return {
+            "success": True,
+            "snapshot": snapshot,
+            "retrieved_at": datetime.now().isoformat()
+        }
+        
+    except PostgrestAPIError as e:
+        logger.error(f"Error fetching dashboard snapshot: {e}")
+        return {
+            "success": False,
+            "error": str(e),
+            "recommendation": "Create mv_dashboard_metrics (see Database Setup)" if e.code == "PGRST205" else None
+        }
+    except Exception as e:
+        logger.error(f"Error fetching dashboard snapshot: {e}")
+        return {"success": False, "error": str(e)}
+
+
 # =============================================================================
 # DEVICE DATA RETRIEVAL TOOLS (Generic Supabase Queries)
 # =============================================================================
 
+@st.cache_data(ttl=DEVICE_LOGS_CACHE_TTL_SECONDS, show_spinner=False)
+def _fetch_device_logs(limit: int, device_id: Optional[str], location: Optional[str],
+                       order_by: Optional[str]) -> List[Dict[str, Any]]:
+    """Query device_power_logs, cached briefly so reruns and repeated tool calls skip the round trip"""
+    from ai_agent import supabase_manager
+    
+    # Build query - only the columns the log table displays
+    query = supabase_manager.client.table("device_power_logs").select(",".join(_DEVICE_LOG_COLUMNS))
+    
+    # Apply filters
+    if device_id:
+        query = query.eq("device_id", device_id)
+    if location:
+        query = query.ilike("Location", f"%{location}%")
+    
+    # Apply ordering and limit
+    if order_by:
+        if ".desc" in order_by:
+            column = order_by.replace(".desc", "")
+            query = query.order(column, desc=True)
+        elif ".asc" in order_by:
+            column = order_by.replace(".asc", "")
+            query = query.order(column, desc=False)
+        else:
+            query = query.order(order_by)
+    
+    query = query.limit(limit)
+    
+    key = ("device_power_logs", "recent", limit, device_id, location, order_by)
+    return _single_flight(key, lambda: query.execute().data)
+
+
+# device_power_logs column -> display column, in display order
+_DEVICE_LOG_COLUMNS = {
+    "device_id": "Device ID",
+    "Location": "Location",
+    "District": "District",
+    "CreatedOnDate": "Date/Time",
+    "PowerStatus": "Power Status",
+    "PumpError": "Pump Error",
+    "Voltage": "Voltage (V)",
+    "Current": "Current (A)",
+    "Temperature": "Temperature (°C)",
+    "LPM": "Water Output (LPM)",
+    "TodayLitre": "Today Litres",
+    "TodayRunTime": "Runtime (min)",
+    "KW": "KW",
+    "Project": "Project",
+    "Franchise": "Franchise"
+}
+
+# Values used when a column is missing from the response entirely
+_DEVICE_LOG_DEFAULTS = {
+    "device_id": "", "Location": "", "District": "", "CreatedOnDate": "", "PowerStatus": None,
+    "PumpError": 0, "Voltage": 0, "Current": 0, "Temperature": 0, "LPM": 0,
+    "TodayLitre": 0, "TodayRunTime": 0, "KW": 0, "Project": "", "Franchise": ""
+}
+
+
 @tool
 def get_recent_device_logs(limit: int = 10, device_id: Optional[str] = None, 
                           location: Optional[str] = None, order_by: str = "CreatedOnDate.desc") -> Dict[str, Any]:
@@ -627,56 +1088,25 @@ def get_recent_device_logs(limit: int = 10, device_id: Optional[str] = None,
     Returns:
         Dict containing formatted device logs for table display
     """
-    from ai_agent import supabase_manager
-    
     try:
         logger.info(f"Fetching {limit} device logs with filters - device_id: {device_id}, location: {location}")
         
-        # Build query
-        query = supabase_manager.client.table("device_power_logs").select("*")
-        
-        # Apply filters
-        if device_id:
-            query = query.eq("device_id", device_id)
-        if location:
-            query = query.ilike("Location", f"%{location}%")
-        
-        # Apply ordering and limit
-        if order_by:
-            if ".desc" in order_by:
-                column = order_by.replace(".desc", "")
-                query = query.order(column, desc=True)
-            elif ".asc" in order_by:
-                column = order_by.replace(".asc", "")
-                query = query.order(column, desc=False)
-            else:
-                query = query.order(order_by)
-        
-        query = query.limit(limit)
-        
-        result = query.execute()
+        rows = _fetch_device_logs(limit, device_id, location, order_by)
         
-        if result.data:
+        if rows:
             # Format for table display
-            formatted_logs = []
-            for log in result.data:
-                formatted_logs.append({
-                    "Device ID": str(log.get("device_id", "")),
-                    "Location": log.get("Location", ""),
-                    "District": log.get("District", ""),
-                    "Date/Time": log.get("CreatedOnDate", ""),
-                    "Power Status": "Active" if log.get("PowerStatus") == 1 else "Inactive",
-                    "Pump Error": log.get("PumpError", 0),
-                    "Voltage (V)": log.get("Voltage", 0),
-                    "Current (A)": log.get("Current", 0),
-                    "Temperature (°C)": log.get("Temperature", 0),
-                    "Water Output (LPM)": log.get("LPM", 0),
-                    "Today Litres": log.get("TodayLitre", 0),
-                    "Runtime (min)": log.get("TodayRunTime", 0),
-                    "KW": log.get("KW", 0),
-                    "Project": log.get("Project", ""),
-                    "Franchise": log.get("Franchise", "")
-                })
+            logs_df = pd.DataFrame(rows, dtype=object)
+            for column, default in _DEVICE_LOG_DEFAULTS.items():
+                if column not in logs_df.columns:
+                    logs_df[column] = default
+            
+            display_df = logs_df[list(_DEVICE_LOG_COLUMNS)].rename(columns=_DEVICE_LOG_COLUMNS)
+            display_df["Device ID"] = display_df["Device ID"].astype(str)
+            display_df["Power Status"] = logs_df["PowerStatus"].eq(1).map({True: "Active", False: "Inactive"})
+            formatted_logs = display_df.to_dict("records")
+            # Arrow-backed columns for the session copy: compact strings, and st.dataframe
+            # serializes them without another pandas -> Arrow conversion on every rerun
+            display_df = display_df.convert_dtypes(dtype_backend="pyarrow")
             
             response_data = {
                 "success": True,
@@ -687,18 +1117,14 @@ def get_recent_device_logs(limit: int = 10, device_id: Optional[str] = None,
                     "location": location,
                     "limit": limit,
                     "order_by": order_by
-                },
-                "raw_data": result.data
+                }
             }
             
             # Store in Streamlit session state for table display
             if hasattr(st, 'session_state'):
-                st.session_state.device_logs_data = response_data
-                
-                # Create DataFrame for easy Streamlit table display
-                if formatted_logs:
-                    st.session_state.device_logs_df = pd.DataFrame(formatted_logs)
-                    logger.info(f"Created DataFrame with {len(formatted_logs)} rows for Streamlit display")
+                # DataFrame for easy Streamlit table display
+                st.session_state.device_logs_df = display_df
+                logger.info(f"Created DataFrame with {len(display_df)} rows for Streamlit display")
                 
                 # Store filter information for UI
                 st.session_state.device_logs_filters = {
@@ -714,7 +1140,6 @@ def get_recent_device_logs(limit: int = 10, device_id: Optional[str] = None,
         
         # Store empty result in session state
         if hasattr(st, 'session_state'):
-            st.session_state.device_logs_data = no_data_response
             st.session_state.device_logs_df = pd.DataFrame()
             
         return no_data_response
@@ -730,6 +1155,41 @@ def get_recent_device_logs(limit: int = 10, device_id: Optional[str] = None,
         return error_response
 
 
+# PumpError values that mean normal operation, not a fault (same set as ai_agent.NORMAL_ERROR_CODES,
+# which can't be imported here at load time because ai_agent imports this module)
+NORMAL_PUMP_ERROR_CODES = frozenset({"", "0", "9999", "NORMAL"})
+
+
+def _aggregate_location_performance(location: Optional[str], district: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Client-side fallback for databases without rpc_location_performance"""
+    from ai_agent import supabase_manager
+    
+    query = supabase_manager.client.table("device_power_logs").select("device_id,TodayLitre,Power_KWH,PumpError")
+    
+    if location:
+        query = query.ilike("Location", f"%{location}%")
+    elif district:
+        query = query.ilike("District", f"%{district}%")
+    
+    key = ("device_power_logs", "location_performance", location, district)
+    result = _single_flight(key, query.execute)
+    
+    if not result.data:
+        return None
+    
+    # One columnar pass instead of a Python loop per metric
+    logs_df = pd.DataFrame(result.data)
+    pump_errors = logs_df["PumpError"].fillna("").astype(str).str.strip()
+    
+    return {
+        "total_devices": int(logs_df["device_id"].nunique()),
+        "total_water": float(pd.to_numeric(logs_df["TodayLitre"]).sum()),
+        "total_energy": float(pd.to_numeric(logs_df["Power_KWH"]).sum()),
+        "error_count": int((~pump_errors.isin(NORMAL_PUMP_ERROR_CODES)).sum()),
+        "total_rows": len(logs_df)
+    }
+
+
 @tool
 def get_location_performance(location: Optional[str] = None, district: Optional[str] = None) -> Dict[str, Any]:
     """
@@ -741,35 +1201,32 @@ def get_location_performance(location: Optional[str] = None, district: Optional[
         
     Returns:
         Dict containing location-based performance metrics
+        
+    Supabase RPC Function: rpc_location_performance
     """
-    from ai_agent import supabase_manager
-    
     try:
-        query = supabase_manager.client.table("device_power_logs").select("*")
-        
-        if location:
-            query = query.ilike("Location", f"%{location}%")
-        elif district:
-            query = query.ilike("District", f"%{district}%")
-        
-        result = query.execute()
-        
-        if result.data:
-            # Calculate aggregated metrics
-            total_devices = len(set(log["device_id"] for log in result.data))
-            total_water_today = sum(log.get("TodayLitre", 0) for log in result.data)
-            total_energy = sum(log.get("Power_KWH", 0) for log in result.data)
-            error_count = sum(1 for log in result.data if log.get("PumpError", 0) > 0)
+        params = {'p_location': location, 'p_district': None if location else district}
+        try:
+            rows = _cached_rpc('rpc_location_performance', params)
+            totals = rows[0] if rows else None
+        except PostgrestAPIError as e:
+            if e.code != 'PGRST202':
+                raise
+            logger.warning("rpc_location_performance not found - aggregating device_power_logs client-side")
+            totals = _aggregate_location_performance(location, district)
+        
+        if totals and totals['total_rows']:
+            error_count = totals['error_count']
             
             return {
                 "success": True,
                 "location_performance": {
                     "filter_criteria": {"location": location, "district": district},
                     "metrics": {
-                        "total_devices": total_devices,
-                        "total_water_production_today": round(total_water_today, 2),
-                        "total_energy_consumption": round(total_energy, 2),
-                        "error_rate_percent": round((error_count / len(result.data)) * 100, 2) if result.data else 0,
+                        "total_devices": totals['total_devices'],
+                        "total_water_production_today": round(float(totals['total_water']), 2),
+                        "total_energy_consumption": round(float(totals['total_energy']), 2),
+                        "error_rate_percent": round((error_count / totals['total_rows']) * 100, 2),
                         "operational_efficiency": "Normal" if error_count == 0 else "Issues Detected"
                     }
                 }
@@ -786,101 +1243,78 @@ def get_location_performance(location: Optional[str] = None, district: Optional[
 # UTILITY AND MONITORING TOOLS
 # =============================================================================
 
+def _ping_rpc() -> Any:
+    """Zero-cost round trip through PostgREST's RPC endpoint (never cached: it reports live health)"""
+    from ai_agent import supabase_manager
+    
+    return supabase_manager.client.rpc('rpc_ping').execute().data
+
+
 @tool
 def test_supabase_rpc_connection() -> Dict[str, Any]:
     """
-    Test Supabase RPC function connectivity and TABLE format parsing.
+    Test Supabase RPC function connectivity with a lightweight probe.
     
     Returns:
         Dict containing connection test results
+        
+    Supabase RPC Function: rpc_ping
     """
-    from ai_agent import supabase_manager
-    
     try:
-        logger.info("Testing Supabase RPC connection and TABLE format compatibility")
+        logger.info("Testing Supabase RPC connection")
         
-        # Test the business performance summary with 1 day
-        result = supabase_manager.client.rpc(
-            'rpc_business_performance_summary',
-            {'p_date_range_days': 1}
-        ).execute()
+        result = _ping_rpc()
         
-        if result.data and len(result.data) > 0:
+        if result == 1:
             response_data = {
                 "success": True,
+                "status": "healthy",
                 "message": "Supabase RPC connection successful",
-                "table_format_working": True,
-                "rows_returned": len(result.data),
-                "sample_row": result.data[0] if result.data else None,
-                "available_metrics": [row['metric_name'] for row in result.data],
-                "test_timestamp": datetime.now().isoformat(),
-                "connection_status": "✅ Connected"
+                "connection_status": "✅ Connected",
+                "test_timestamp": datetime.now().isoformat()
             }
-            
-            # Store detailed test results in Streamlit session state
-            if hasattr(st, 'session_state'):
-                st.session_state.rpc_test_results = response_data
-                st.session_state.rpc_connection_status = "healthy"
-                st.session_state.last_rpc_test = datetime.now().isoformat()
-                
-                # Create a summary for dashboard display
-                st.session_state.rpc_test_summary = {
-                    "status": "✅ RPC Connection Healthy",
-                    "table_format": "✅ Working",
-                    "rows_returned": len(result.data),
-                    "sample_metrics": result.data[:3] if len(result.data) >= 3 else result.data,
-                    "test_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                logger.info("RPC connection test successful - stored results in session state")
-                
-            return response_data
+            logger.info("RPC connection test successful")
         else:
-            failure_response = {
+            response_data = {
                 "success": False,
-                "message": "RPC function returned no data",
-                "table_format_working": False,
+                "status": "no_data",
+                "message": f"rpc_ping returned unexpected data: {result!r}",
                 "connection_status": "⚠️ No Data",
+                "recommendation": "Check the rpc_ping function definition",
                 "test_timestamp": datetime.now().isoformat()
             }
-            
-            # Store failure in session state
-            if hasattr(st, 'session_state'):
-                st.session_state.rpc_test_results = failure_response
-                st.session_state.rpc_connection_status = "no_data"
-                st.session_state.rpc_test_summary = {
-                    "status": "⚠️ RPC Returns No Data",
-                    "recommendation": "Check if device_power_logs table has data"
-                }
-                
-            return failure_response
         
     except Exception as e:
         logger.error(f"RPC connection test failed: {e}")
         
-        error_response = {
+        response_data = {
             "success": False,
+            "status": "error",
             "message": f"RPC connection test failed: {str(e)}",
-            "table_format_working": False,
             "error": str(e),
             "connection_status": "❌ Failed",
+            "recommendation": "Check Supabase connection and RPC function creation",
             "test_timestamp": datetime.now().isoformat()
         }
-        
-        # Store error in session state
-        if hasattr(st, 'session_state'):
-            st.session_state.rpc_test_results = error_response
-            st.session_state.rpc_connection_status = "error"
-            st.session_state.rpc_test_summary = {
-                "status": "❌ RPC Connection Failed",
-                "error": str(e),
-                "recommendation": "Check Supabase connection and RPC function creation"
-            }
-            
-        return error_response
+    
+    # Store test results in Streamlit session state
+    if hasattr(st, 'session_state'):
+        st.session_state.rpc_test_results = response_data
+    
+    return response_data
+
+# Device IDs are 12-18 digit numbers (IMEIs such as 865198074539541); compiled once at import
+DEVICE_ID_RE = re.compile(r"\b\d{12,18}\b")
+
+def extract_device_id(value: Any) -> Optional[int]:
+    """Device ID from an int or from text containing one ("device 865198074539541"); None if absent"""
+    if isinstance(value, int):
+        return value
+    match = DEVICE_ID_RE.search(str(value)) if value else None
+    return int(match.group()) if match else None
 
 @tool
-def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Current,Temperature,CreatedOnDate,Location", device_id: int = None, date: str = None, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Current,Temperature,CreatedOnDate,Location", device_id: int = None, date: str = None, filters: Dict[str, Any] = None, limit: int = DEVICE_POWER_DATA_LIMIT, include_sample: bool = False, store_for_chart: bool = True) -> Dict[str, Any]:
     """
     Retrieve IoT device data with flexible column selection and filtering.
     
@@ -892,6 +1326,10 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
         device_id: The unique identifier for the IoT device (optional filter)
         date: Date to filter by in YYYY-MM-DD format (optional filter)
         filters: Additional filter conditions as key-value pairs (e.g., {"PumpError": "4", "Location": "Delhi"})
+        limit: Maximum number of most recent records to retrieve (default: 1000)
+        include_sample: Also return the first 5 raw records as sample_data (default: False)
+        store_for_chart: Keep the records in session state so the app can chart them;
+            set False for lookups that don't need a visualization (default: True)
         
     Returns:
         Dict[str, Any]: Device data with selected columns and computed insights
@@ -911,6 +1349,12 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
     """
     from ai_agent import supabase_manager
     
+    if device_id:
+        parsed_device_id = extract_device_id(device_id)
+        if parsed_device_id is None:
+            return {"success": False, "error": f"Invalid device ID: {device_id}"}
+        device_id = parsed_device_id
+    
     logger.info(f"Fetching device data - device_id: {device_id}, date: {date}, columns: {columns}")
     
     try:
@@ -921,9 +1365,10 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
             if device_id:
                 query = query.eq("device_id", device_id)
             
-            # Apply date filter using LIKE for partial matching
+            # Apply date filter as a half-open range so CreatedOnDate indexes can be used
             if date:
-                query = query.like("CreatedOnDate", f"{date}%")
+                next_day = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+                query = query.gte("CreatedOnDate", date).lt("CreatedOnDate", next_day)
             
             # Apply additional filters if provided
             if filters:
@@ -937,29 +1382,25 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
                     else:
                         query = query.eq(column, value)
             
-            return query.order("CreatedOnDate", desc=True).execute()
+            return query.order("CreatedOnDate", desc=True).limit(limit).execute()
         
-        result = supabase_manager.execute_with_retry(get_device_logs)
+        key = ("device_power_logs", "power_data", columns, device_id, date, repr(filters), limit)
+        result = _single_flight(key, lambda: supabase_manager.execute_with_retry(get_device_logs))
         
         if isinstance(result, dict) and "error" in result:
             return result
         
         if not result:
-            def get_available_data():
-                return supabase_manager.client.table("device_power_logs")\
-                    .select("device_id, CreatedOnDate")\
-                    .limit(50)\
-                    .execute()
-            
-            available = supabase_manager.execute_with_retry(get_available_data)
             suggestions = {}
-            if isinstance(available, list) and available:
-                device_ids = list(set([str(record.get("device_id")) for record in available if record.get("device_id")]))
-                dates = list(set([record.get("CreatedOnDate", "")[:10] for record in available if record.get("CreatedOnDate")]))
-                suggestions = {
-                    "available_device_ids": device_ids[:5],
-                    "available_dates": dates[:5]
-                }
+            try:
+                device_ids, dates = _known_devices_and_dates()
+                if device_ids or dates:
+                    suggestions = {
+                        "available_device_ids": device_ids[:5],
+                        "available_dates": dates[:5]
+                    }
+            except Exception as e:
+                logger.warning(f"Could not load device/date suggestions: {e}")
             
             return {
                 "success": False,
@@ -968,45 +1409,52 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
                 "suggestions": suggestions
             }
         
+        truncated = len(result) >= limit
+        if truncated:
+            logger.warning(f"Device data query hit the {limit} record limit - results truncated to the most recent records")
+        
+        # Selected columns, parsed once (substring checks on the raw string misfire, e.g. "Power" in "Power_KWH")
+        selected_columns = [column.strip() for column in columns.split(",")]
+        col_set = set(selected_columns)
+        select_all = "*" in col_set
+        
         # Analyze data based on selected columns
         analysis = {
             "total_records": len(result),
-            "columns_retrieved": columns.split(",") if columns != "*" else "all"
+            "truncated": truncated,
+            "columns_retrieved": "all" if select_all else selected_columns
         }
         
+        records_df = pd.DataFrame(result)
+        
         # Error analysis (only if PumpError column is selected)
-        if "PumpError" in columns or columns == "*":
-            error_records = [record for record in result if record.get("PumpError", "").strip() not in ["", "0", "9999", "NORMAL"]]
-            error_codes = [record.get("PumpError") for record in error_records]
+        if (select_all or "PumpError" in col_set) and "PumpError" in records_df.columns:
+            pump_errors = records_df["PumpError"]
+            error_mask = ~pump_errors.fillna("").astype(str).str.strip().isin(NORMAL_PUMP_ERROR_CODES)
+            error_count = int(error_mask.sum())
             analysis.update({
-                "error_count": len(error_records),
-                "error_rate": len(error_records) / len(result) if result else 0,
-                "unique_error_codes": list(set(error_codes)) if error_codes else []
+                "error_count": error_count,
+                "error_rate": error_count / len(records_df),
+                "unique_error_codes": pump_errors[error_mask].unique().tolist()
             })
         
         # Power analysis (only if Power column is selected)
-        if "Power" in columns or columns == "*":
-            power_values = []
-            for record in result:
-                power_str = record.get("Power", "0")
-                try:
-                    # Handle different power formats (e.g., "150W", "150", etc.)
-                    power_val = float(str(power_str).replace("W", "").replace("w", "").strip())
-                    power_values.append(power_val)
-                except:
-                    power_values.append(0)
-            
-            if power_values:
-                analysis.update({
-                    "power_statistics": {
-                        "average": sum(power_values) / len(power_values),
-                        "max": max(power_values),
-                        "min": min(power_values)
-                    }
-                })
+        if (select_all or "Power" in col_set) and "Power" in records_df.columns:
+            # Handle different power formats (e.g., "150W", "150", etc.); unparseable values count as 0
+            power_values = pd.to_numeric(
+                records_df["Power"].astype(str).str.replace(r"[Ww]", "", regex=True).str.strip(),
+                errors="coerce"
+            ).fillna(0)
+            analysis.update({
+                "power_statistics": {
+                    "average": float(power_values.mean()),
+                    "max": float(power_values.max()),
+                    "min": float(power_values.min())
+                }
+            })
         
         # Time analysis (if CreatedOnDate column is selected)
-        if "CreatedOnDate" in columns or columns == "*":
+        if select_all or "CreatedOnDate" in col_set:
             analysis.update({
                 "time_range": {
                     "latest": result[0].get("CreatedOnDate") if result else None,
@@ -1016,16 +1464,23 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
         
         # Store in Streamlit session for visualization
         if hasattr(st, 'session_state'):
-            st.session_state.last_tool_data = result
+            if store_for_chart:
+                st.session_state.last_tool_data = result
+            else:
+                # Don't let the app chart a previous query's records against this answer
+                st.session_state.pop('last_tool_data', None)
             st.session_state.device_insights = analysis
         
-        return {
+        response_data = {
             "success": True,
             "query_params": {"device_id": device_id, "date": date, "columns": columns, "filters": filters},
             "analysis": analysis,
-            "sample_data": result[:5],  # Show first 5 records as sample
             "retrieved_at": datetime.now().isoformat()
         }
+        if include_sample:
+            response_data["sample_data"] = result[:5]
+        
+        return response_data
         
     except Exception as e:
         logger.error(f"Device data query error: {e}")
@@ -1036,6 +1491,152 @@ def get_device_power_data(columns: str = "device_id,PumpError,Power,Voltage,Curr
             "retrieved_at": datetime.now().isoformat()
         }
 
+def _aggregate_device_errors(device_id: int) -> Dict[str, Any]:
+    """Client-side fallback for databases without get_device_error_summary (most recent rows only)"""
+    from ai_agent import supabase_manager
+    
+    def get_error_codes():
+        return (supabase_manager.client.table("device_power_logs")
+                .select("PumpError")
+                .eq("device_id", device_id)
+                .order("CreatedOnDate", desc=True)
+                .limit(DEVICE_POWER_DATA_LIMIT)
+                .execute())
+    
+    key = ("device_power_logs", "error_summary", device_id)
+    result = _single_flight(key, get_error_codes)
+    
+    error_codes = pd.Series([row.get("PumpError") for row in result.data], dtype=object).fillna("").astype(str).str.strip()
+    error_codes = error_codes[~error_codes.isin(NORMAL_PUMP_ERROR_CODES)]
+    return {
+        "total_records": len(result.data),
+        "truncated": len(result.data) >= DEVICE_POWER_DATA_LIMIT,
+        "error_count": len(error_codes),
+        "error_code_counts": {code: int(count) for code, count in error_codes.value_counts().items()},
+        "latest_record": None
+    }
+
+
+@tool
+def get_device_error_summary(device_id: int) -> Dict[str, Any]:
+    """
+    Summarize pump errors across a device's full history, aggregated in the database.
+    
+    Use this instead of get_device_power_data when the question is only about error codes
+    (which errors, how often): just the counts come back, not every log row.
+    
+    Args:
+        device_id: The unique identifier for the IoT device
+        
+    Returns:
+        Dict containing record/error totals, per-code counts and the latest log record
+        (truncated is True when the counts cover only the most recent records)
+        
+    Supabase RPC Function: get_device_error_summary
+    """
+    parsed_device_id = extract_device_id(device_id)
+    if parsed_device_id is None:
+        return {"success": False, "error": f"Invalid device ID: {device_id}"}
+    device_id = parsed_device_id
+    
+    try:
+        method = "database_function"
+        try:
+            summary = _cached_rpc('get_device_error_summary', {'p_device_id': device_id})
+        except PostgrestAPIError as e:
+            if e.code != 'PGRST202':
+                raise
+            logger.warning("get_device_error_summary not found - aggregating device_power_logs client-side")
+            summary = _aggregate_device_errors(device_id)
+            method = "client_side"
+        
+        if not summary or not summary['total_records']:
+            return {"success": False, "device_id": device_id, "error": "No data found for this device"}
+        
+        # Only the client-side fallback is capped; the database function counts every record
+        truncated = summary.get('truncated', False)
+        if truncated:
+            logger.warning(f"Device error summary fallback hit the {DEVICE_POWER_DATA_LIMIT} record limit - counts cover the most recent records only")
+        
+        error_code_counts = dict(sorted(summary['error_code_counts'].items(), key=lambda item: -item[1]))
+        
+        # Same shape the app's error code chart reads (error_breakdown -> {code: {"count"}})
+        if hasattr(st, 'session_state'):
+            st.session_state.last_error_analysis = {
+                "error_breakdown": {code: {"count": count} for code, count in error_code_counts.items()}
+            }
+        
+        return {
+            "success": True,
+            "device_id": device_id,
+            "total_records": summary['total_records'],
+            "truncated": truncated,
+            "error_count": summary['error_count'],
+            "error_rate": summary['error_count'] / summary['total_records'],
+            "unique_error_codes": list(error_code_counts),
+            "error_code_counts": error_code_counts,
+            "latest_record": summary['latest_record'],
+            "method": method,
+            "retrieved_at": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching device error summary: {e}")
+        return {"success": False, "device_id": device_id, "error": str(e)}
+
+
+@st.cache_data(ttl=DEVICE_CATALOG_CACHE_TTL_SECONDS, show_spinner=False)
+def _known_devices_and_dates() -> Tuple[List[str], List[str]]:
+    """Recent device IDs and dates to suggest when a device data query comes back empty"""
+    from ai_agent import supabase_manager
+    
+    try:
+        # Precomputed catalog (see the database setup SQL) - avoids touching the log table
+        rows = supabase_manager.client.table("mv_dpl_catalog")\
+            .select("device_id,log_date")\
+            .order("log_date", desc=True)\
+            .limit(DEVICE_CATALOG_SAMPLE_SIZE)\
+            .execute().data
+    except PostgrestAPIError as e:
+        logger.info(f"mv_dpl_catalog unavailable ({e.code}) - sampling device_power_logs")
+        rows = [
+            {"device_id": record.get("device_id"), "log_date": (record.get("CreatedOnDate") or "")[:10]}
+            for record in supabase_manager.client.table("device_power_logs")
+                .select("device_id,CreatedOnDate")
+                .limit(DEVICE_CATALOG_SAMPLE_SIZE)
+                .execute().data
+        ]
+    
+    device_ids = list(dict.fromkeys(str(row["device_id"]) for row in rows if row.get("device_id")))
+    dates = list(dict.fromkeys(str(row["log_date"]) for row in rows if row.get("log_date")))
+    return device_ids, dates
+
+
+@st.cache_data(ttl=CUSTOMER_PROFILE_CACHE_TTL_SECONDS, max_entries=CUSTOMER_PROFILE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _fetch_customer_profile(device_id: int) -> List[Dict[str, Any]]:
+    """Fetch customer_profile rows for a device; profiles change rarely so they are cached longer"""
+    from ai_agent import supabase_manager
+    
+    def get_customer_data():
+        return supabase_manager.client.table("customer_profile")\
+            .select("*")\
+            .eq("Device_id", device_id)\
+            .execute()
+    
+    result = _single_flight(("customer_profile", device_id),
+                            lambda: supabase_manager.execute_with_retry(get_customer_data))
+    
+    # Raise rather than return so failures are never cached
+    if isinstance(result, dict) and "error" in result:
+        raise LookupError(result["error"])
+    
+    return result
+
+
+def clear_customer_profile_cache() -> None:
+    """Drop cached customer profiles (e.g. after reconnecting to a different database)"""
+    _fetch_customer_profile.clear()
+
 
 @tool
 def get_customer_device_info(device_id: int) -> Dict[str, Any]:
@@ -1048,24 +1649,21 @@ def get_customer_device_info(device_id: int) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Customer information and device context
     """
-    from ai_agent import supabase_manager
-    
     if not device_id:
         return {"error": "Device ID is required"}
     
+    parsed_device_id = extract_device_id(device_id)
+    if parsed_device_id is None:
+        return {"error": f"Invalid device ID: {device_id}"}
+    device_id = parsed_device_id
+    
     logger.info(f"Fetching customer info for device ID: {device_id}")
     
     try:
-        def get_customer_data():
-            return supabase_manager.client.table("customer_profile")\
-                .select("*")\
-                .eq("Device_id", device_id)\
-                .execute()
-        
-        result = supabase_manager.execute_with_retry(get_customer_data)
-        
-        if isinstance(result, dict) and "error" in result:
-            return result
+        try:
+            result = _fetch_customer_profile(device_id)
+        except LookupError as e:
+            return {"error": str(e)}
         
         if not result:
             return {
@@ -1075,7 +1673,7 @@ def get_customer_device_info(device_id: int) -> Dict[str, Any]:
                 "suggestion": "Verify device ID and ensure customer profile is properly configured"
             }
         
-        customer_info = result[0] if result else {}
+        customer_info = result[0]
         
         return {
             "success": True,
@@ -1102,6 +1700,8 @@ def get_all_tools():
         get_high_error_devices,
         analyze_overvoltage_impact,
         get_fleet_health_overview,
+        get_dashboard_overview,
+        get_dashboard_snapshot,
         
         # Device Data Tools (Direct Queries)
         get_recent_device_logs,
@@ -1112,7 +1712,8 @@ def get_all_tools():
         
         # Note: Keep your existing query_supabase_database tool if needed for other queries
         get_customer_device_info,
-        get_device_power_data
+        get_device_power_data,
+        get_device_error_summary
     ]
 
 
@@ -1125,77 +1726,88 @@ def display_session_data_summary():
     if not hasattr(st, 'session_state'):
         return None
     
+    ss = st.session_state
     summary = {}
     
     # Business performance data
-    if hasattr(st.session_state, 'business_performance_data'):
+    bp_data = ss.get('business_performance_data')
+    if bp_data is not None:
         summary['business_performance'] = {
             'status': 'loaded',
-            'devices': st.session_state.business_performance_data.get('summary', {}).get('fleet_metrics', {}).get('total_active_devices', 0)
+            'devices': bp_data.get('summary', {}).get('fleet_metrics', {}).get('total_active_devices', 0)
         }
     
     # Critical issues data
-    if hasattr(st.session_state, 'critical_issues_summary'):
-        summary['critical_issues'] = st.session_state.critical_issues_summary
+    if ss.get('critical_issues_summary') is not None:
+        summary['critical_issues'] = ss.get('critical_issues_summary')
     
     # Device logs data  
-    if hasattr(st.session_state, 'device_logs_data'):
+    logs_df = ss.get('device_logs_df')
+    if logs_df is not None:
         summary['device_logs'] = {
             'status': 'loaded',
-            'count': st.session_state.device_logs_data.get('count', 0)
+            'count': len(logs_df)
         }
     
     # Installation stats data
-    if hasattr(st.session_state, 'installation_summary'):
-        summary['installation_stats'] = st.session_state.installation_summary
+    if ss.get('installation_summary') is not None:
+        summary['installation_stats'] = ss.get('installation_summary')
     
     # Fleet health data
-    if hasattr(st.session_state, 'fleet_dashboard_metrics'):
-        summary['fleet_health'] = st.session_state.fleet_dashboard_metrics
+    if ss.get('fleet_dashboard_metrics') is not None:
+        summary['fleet_health'] = ss.get('fleet_dashboard_metrics')
     
     # Location performance data
-    if hasattr(st.session_state, 'location_performance_summary'):
-        summary['location_performance'] = st.session_state.location_performance_summary
+    if ss.get('location_performance_summary') is not None:
+        summary['location_performance'] = ss.get('location_performance_summary')
+    
+    # Dashboard snapshot (mv_dashboard_metrics)
+    if ss.get('dashboard_snapshot') is not None:
+        summary['dashboard_snapshot'] = ss.get('dashboard_snapshot')
     
     # RPC connection status
-    if hasattr(st.session_state, 'rpc_connection_status'):
-        summary['rpc_status'] = st.session_state.rpc_connection_status
+    rpc_results = ss.get('rpc_test_results')
+    if rpc_results is not None:
+        summary['rpc_status'] = rpc_results.get('status')
     
     return summary
 
 
+# Agent-related session state keys removed by clear_session_cache
+_SESSION_CACHE_KEYS = frozenset([
+    'business_performance_data',
+    'critical_issues_data', 
+    'critical_issues_summary',
+    'device_logs_df',
+    'high_error_devices_data',
+    'high_error_devices_df',
+    'error_device_alerts',
+    '_he_devices_hash',
+    'rpc_test_results',
+    'last_error_analysis',
+    'overvoltage_analysis_data',
+    'installation_stats_data',
+    'installation_summary',
+    'installation_locations_df',
+    'installation_franchise_df',
+    'fleet_health_data',
+    'fleet_dashboard_metrics',
+    'geographic_health_df',
+    '_fleet_health_hash',
+    'location_performance_data',
+    'location_performance_summary',
+    'location_devices_df',
+    'dashboard_snapshot'
+])
+
+
 def clear_session_cache():
     """Helper function to clear agent-related session state data"""
     if not hasattr(st, 'session_state'):
         return
     
-    # Clear main data stores
-    keys_to_clear = [
-        'business_performance_data',
-        'critical_issues_data', 
-        'critical_issues_summary',
-        'device_logs_data',
-        'device_logs_df',
-        'high_error_devices_data',
-        'high_error_devices_df',
-        'error_device_alerts',
-        'rpc_test_results',
-        'overvoltage_analysis_data',
-        'installation_stats_data',
-        'installation_summary',
-        'installation_locations_df',
-        'installation_franchise_df',
-        'fleet_health_data',
-        'fleet_dashboard_metrics',
-        'geographic_health_df',
-        'location_performance_data',
-        'location_performance_summary',
-        'location_devices_df'
-    ]
-    
-    for key in keys_to_clear:
-        if hasattr(st.session_state, key):
-            delattr(st.session_state, key)
+    for key in _SESSION_CACHE_KEYS:
+        st.session_state.pop(key, None)
     
     logger.info("Cleared agent session state cache")
 
@@ -1205,49 +1817,66 @@ def get_dashboard_metrics():
     if not hasattr(st, 'session_state'):
         return {}
     
+    ss = st.session_state
     metrics = {}
     
     # Extract business metrics
-    if hasattr(st.session_state, 'business_performance_data'):
-        bp_data = st.session_state.business_performance_data
-        if bp_data.get('success'):
-            summary = bp_data.get('summary', {})
-            metrics['total_devices'] = summary.get('fleet_metrics', {}).get('total_active_devices', 0)
-            metrics['new_devices'] = summary.get('new_devices_installed', 0)
-            metrics['co2_savings'] = summary.get('environmental_impact', {}).get('co2_savings_tonnes_annual', 0)
-            metrics['water_production'] = summary.get('fleet_metrics', {}).get('total_water_produced_today', 0)
-            metrics['fleet_uptime'] = summary.get('health_overview', {}).get('fleet_uptime_percent', 0)
+    bp_data = ss.get('business_performance_data')
+    if bp_data is not None and bp_data.get('success'):
+        summary = bp_data.get('summary', {})
+        metrics['total_devices'] = summary.get('fleet_metrics', {}).get('total_active_devices', 0)
+        metrics['new_devices'] = summary.get('new_devices_installed', 0)
+        metrics['co2_savings'] = summary.get('environmental_impact', {}).get('co2_savings_tonnes_annual', 0)
+        metrics['water_production'] = summary.get('fleet_metrics', {}).get('total_water_produced_today', 0)
+        metrics['fleet_uptime'] = summary.get('health_overview', {}).get('fleet_uptime_percent', 0)
     
     # Extract installation metrics
-    if hasattr(st.session_state, 'installation_summary'):
-        install_data = st.session_state.installation_summary
+    install_data = ss.get('installation_summary')
+    if install_data is not None:
         metrics['installations_period'] = install_data.get('new_devices', 0)
         metrics['installation_co2_impact'] = install_data.get('co2_savings', 0)
         metrics['top_location'] = install_data.get('top_location', 'N/A')
         metrics['top_franchise'] = install_data.get('top_franchise', 'N/A')
     
     # Extract error metrics
-    if hasattr(st.session_state, 'error_device_alerts'):
-        alerts = st.session_state.error_device_alerts
+    alerts = ss.get('error_device_alerts')
+    if alerts is not None:
         metrics['error_devices'] = alerts.get('total', 0)
         metrics['critical_devices'] = alerts.get('critical', 0)
     
     # Extract issue metrics
-    if hasattr(st.session_state, 'critical_issues_summary'):
-        issues = st.session_state.critical_issues_summary
+    issues = ss.get('critical_issues_summary')
+    if issues is not None:
         metrics['total_issues'] = issues.get('total_issues', 0)
         metrics['critical_issues'] = issues.get('critical_count', 0)
     
     # Extract fleet health metrics
-    if hasattr(st.session_state, 'fleet_dashboard_metrics'):
-        fleet_data = st.session_state.fleet_dashboard_metrics
+    fleet_data = ss.get('fleet_dashboard_metrics')
+    if fleet_data is not None:
         metrics['fleet_health_status'] = fleet_data.get('health_status', 'Unknown')
         metrics['operational_rate'] = fleet_data.get('operational_rate', 0)
         metrics['energy_efficiency'] = fleet_data.get('energy_efficiency', 0)
     
+    # Fill anything the individual tools haven't produced from the precomputed snapshot
+    snapshot = ss.get('dashboard_snapshot')
+    if snapshot is not None:
+        metrics.setdefault('total_devices', snapshot.get('total_devices', 0))
+        metrics.setdefault('error_devices', snapshot.get('error_devices', 0))
+        metrics.setdefault('water_production', snapshot.get('water_today', 0))
+        metrics.setdefault('energy_efficiency', snapshot.get('energy_efficiency', 0))
+        metrics.setdefault('top_location', snapshot.get('top_location', 'N/A'))
+    
     return metrics
 
 
+# (display column, format template, placeholder for missing values)
+_DEVICE_LOG_NUMBER_FORMATS = [
+    ("Voltage (V)", "{:.1f}V", "N/A"),
+    ("Temperature (°C)", "{:.1f}°C", "N/A"),
+    ("Water Output (LPM)", "{:.0f}", "0"),
+]
+
+
 def format_device_logs_for_display(logs_data: List[Dict]) -> pd.DataFrame:
     """Format device logs data for optimal Streamlit table display"""
     if not logs_data:
@@ -1266,14 +1895,10 @@ def format_device_logs_for_display(logs_data: List[Dict]) -> pd.DataFrame:
     available_columns = [col for col in display_columns if col in df.columns]
     df_display = df[available_columns].copy()
     
-    # Format numerical columns
-    if "Voltage (V)" in df_display.columns:
-        df_display["Voltage (V)"] = df_display["Voltage (V)"].apply(lambda x: f"{x:.1f}V" if pd.notna(x) else "N/A")
-    
-    if "Temperature (°C)" in df_display.columns:
-        df_display["Temperature (°C)"] = df_display["Temperature (°C)"].apply(lambda x: f"{x:.1f}°C" if pd.notna(x) else "N/A")
-    
-    if "Water Output (LPM)" in df_display.columns:
-        df_display["Water Output (LPM)"] = df_display["Water Output (LPM)"].apply(lambda x: f"{x:.0f}" if pd.notna(x) else "0")
+    # Format numerical columns (one vectorized pass per column)
+    for column, template, missing in _DEVICE_LOG_NUMBER_FORMATS:
+        if column in df_display.columns:
+            values = pd.to_numeric(df_display[column], errors="coerce")
+            df_display[column] = values.map(template.format).where(values.notna(), missing)
     
     return df_display
\ No newline at end of file
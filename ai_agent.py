@@ -6,606 +6,346 @@ Author: Siddarth Gogulapati
 Date: August 2025
 """
 
-import os
 import json
+import types
 import time
 import logging
 import asyncio
+import importlib.util
+import threading
 import streamlit as st
 import pandas as pd
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, NamedTuple, Final, Callable, Iterator
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-# Core imports
-from strands import Agent, tool
-from strands.models.anthropic import AnthropicModel  # Using Anthropic model directly
-from supabase import create_client, Client
+# Core imports - the Anthropic SDK (via strands.models.anthropic) and supabase are imported where
+# they are first used, so pages that never build an agent or a manager don't pay for them
+import httpx
 from postgrest.exceptions import APIError as PostgrestAPIError
 
+if TYPE_CHECKING:
+    from strands.models.anthropic import AnthropicModel
+    from supabase import Client
+
 # =============================================================================
 # CONFIGURATION CONSTANTS - Dextro Platform Configuration
 # =============================================================================
 
-# Try to import Streamlit for secrets management
-try:
-    import streamlit as st
-    # Load from Streamlit secrets if available
-    SUPABASE_URL = st.secrets["supabase"]["url"]
-    SUPABASE_KEY = st.secrets["supabase"]["key"]
-    CLAUDE_KEY = st.secrets["anthropic"]["api_key"]
-    CLAUDE_MODEL = st.secrets["claude"]["model"]
-    TEMPERATURE = st.secrets["claude"]["temperature"]
-    MAX_TOKENS = st.secrets["claude"]["max_tokens"]
-except (ImportError, KeyError, AttributeError):
-    # Fallback to environment variables for non-Streamlit contexts
-    SUPABASE_URL = os.getenv("SUPABASE_URL", "")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
-    CLAUDE_KEY = os.getenv("CLAUDE_API_KEY", "")
-    CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-7-sonnet-20250219")
-    TEMPERATURE = float(os.getenv("CLAUDE_TEMPERATURE", "0.3"))
-    MAX_TOKENS = int(os.getenv("CLAUDE_MAX_TOKENS", "3000"))
-
-REQUEST_TIMEOUT = 60
+# Secrets come from Streamlit when available, otherwise from the environment (see config.py)
+from config import SUPABASE_URL, SUPABASE_KEY, CLAUDE_KEY, CLAUDE_MODEL, TEMPERATURE, MAX_TOKENS, env_bool
+
+REQUEST_TIMEOUT: Final[int] = 60
+CONNECT_TIMEOUT: Final[float] = 5.0
+MAX_CONNECTIONS: Final[int] = 120
+MAX_KEEPALIVE_CONNECTIONS: Final[int] = 80
+KEEPALIVE_EXPIRY: Final[int] = 60
+CONNECT_RETRIES: Final[int] = 3
+RETRY_BACKOFF_INITIAL_SECONDS: Final[float] = 0.1
+RETRY_BACKOFF_MAX_SECONDS: Final[float] = 10.0
+SYSTEM_PROMPT_TOKEN_COUNT_TIMEOUT: Final[float] = 10.0
+DEVICE_POWER_LOGS_CACHE_TTL_SECONDS: Final[int] = 300
+# PostgREST error codes worth retrying: HTTP status of non-JSON gateway/rate-limit responses,
+# PostgREST's lost database connection codes, and Postgres serialization failure/deadlock
+TRANSIENT_POSTGREST_CODES: Final[frozenset] = frozenset({
+    "429", "500", "502", "503", "504",
+    "PGRST000", "PGRST001", "PGRST002",
+    "40001", "40P01",
+})
 
 # System Prompts for Dextro IoT Platform
-SYSTEM_PROMPT = """You are Dextro Devi IoT device monitoring assistant for the Dextro platform with access to comprehensive device analytics and database operations.
-
-DATABASE SCHEMA REFERENCE:
-You have access to these tables with the following structure:
-
-TABLE: device_power_logs
-- device_id (bigint): Unique device identifier
-- PowerStatus (bigint): Device power status
-- PumpStatus (text): Pump operational status
-- PumpError (text): Pump error codes (various custom codes)
-- Voltage (double precision): Device voltage
-- Current (text): Device current
-- Frequency (text): Operating frequency
-- Temperature (double precision): Device temperature
-- Power (text): Power consumption
-- PhaseCurrentRYB (text): Phase current readings
-- LPM (text): Liters per minute flow rate
-- TodayLitre (double precision): Daily water volume
-- TotalLitres (double precision): Total water volume
-- TodayRunTime (double precision): Daily runtime
-- TotalRunTime (double precision): Total runtime
-- GSMSignal (bigint): GSM signal strength
-- Power_KWH (double precision): Power consumption in KWH
-- CreatedOnDate (text): Timestamp of record creation
-- Model_Number (text): Device model
-- Location (text): Installation location
-- District (text): District location
-- KW (text): Power rating
-- Project (text): Project name
-- Franchise (text): Franchise information
-
-TABLE: customer_profile
-- Device_id (bigint): Device identifier (links to device_power_logs.device_id)
-- Model_Number (text): Device model
-- Location (text): Customer location
-- District (text): District
-- KW (double precision): Power rating
-- Project (text): Project name
-- Franchise (text): Franchise name
-
-IMPORTANT: Always use correct column names - CreatedOnDate (not created_on_date), PumpError (not pump_error), etc.
-
-ERROR CODE HANDLING:
-
-CRITICAL ERROR CODE INTERPRETATION:
-- Error codes "0" and "9999" indicate NORMAL OPERATION, NOT errors
-- When analyzing system health, if devices show only "0" and "9999" codes, report the system as HEALTHY
-- Only treat other numeric codes (1-36) as actual error conditions requiring attention
-
-- When PumpError is "0", "9999", "NORMAL", or empty, report "No error - system operating normally"
-- CRITICAL: Codes "0" and "9999" are NORMAL OPERATION, not errors. Do NOT include them in error counts or treat them as problems.
-- System health should be reported as HEALTHY when devices show only normal operation codes (0, 9999, NORMAL)
-When analyzing IoT device data and pump error codes, follow these guidelines:
-
-This table provides comprehensive error code information for Variable Frequency Drive (VFD) faults in solar-powered water pumping systems.
-
-Error Code 0: No Fault
-
-Description: System operating normally with no detected faults
-Cause: Normal operating condition
-Solution: No action required
-
-Error Code 9999: No Fault
-
-Description: System operating normally with no detected faults
-Cause: Normal operating condition
-Solution: No action required
-
-Error Code 1: OUt1 - Inverter Unit U Phase Protection
-
-Description: Protection triggered on the U phase of the inverter unit
-Cause: Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding
-Solution: Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference
-
-Error Code 2: OUt2 - Inverter Unit V Phase Protection
-
-Description: Protection triggered on the V phase of the inverter unit
-Cause: Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding
-Solution: Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference
-
-Error Code 3: OUt3 - Inverter Unit W Phase Protection
-
-Description: Protection triggered on the W phase of the inverter unit
-Cause: Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding
-Solution: Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference
-
-Error Code 4: OC1 - Overcurrent During Acceleration
-
-Description: Excessive current detected during motor acceleration phase
-Cause: Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled
-Solution: Increase acceleration time, check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings
-
-Error Code 5: OC2 - Overcurrent During Deceleration
-
-Description: Excessive current detected during motor deceleration phase
-Cause: Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled
-Solution: Increase deceleration time, check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings
-
-Error Code 6: OC3 - Overcurrent During Constant Speed Running
-
-Description: Excessive current detected during steady-state motor operation
-Cause: Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled
-Solution: Check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings
-
-Error Code 7: OV1 - Overvoltage During Acceleration
-
-Description: Direct current bus voltage exceeded limits during acceleration
-Cause: Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled
-Solution: Check input power supply, verify deceleration time is appropriate, install braking components if needed, check related function code settings
-
-Error Code 8: OV2 - Overvoltage During Deceleration
-
-Description: Direct current bus voltage exceeded limits during deceleration
-Cause: Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled
-Solution: Check input power supply, verify deceleration time is appropriate, install braking components if needed, check related function code settings
-
-Error Code 9: OV3 - Overvoltage During Constant Speed Running
-
-Description: Direct current bus voltage exceeded limits during steady-state operation
-Cause: Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled
-Solution: Check input power supply, verify motor is not being driven externally, install braking components if needed, check related function code settings
-
-Error Code 10: UV - Bus Undervoltage
-
-Description: Direct current bus voltage below minimum operating threshold
-Cause: Power supply voltage too low
-Solution: Check input power supply line voltage and stability
-
-Error Code 11: OL1 - Motor Overload
 
-Description: Motor drawing excessive current for extended period
-Cause: Power supply voltage too low, motor rated current setting incorrect, motor stall or load transients too strong
-Solution: Check power supply line, reset motor rated current parameters, check load conditions and adjust torque lift settings
-
-Error Code 12: OL2 - Variable Frequency Drive Overload
-
-Description: Variable Frequency Drive operating beyond rated capacity
-Cause: Acceleration too fast, restarting rotating motor, power supply voltage too low, load too heavy, motor power too large for Variable Frequency Drive capacity
-Solution: Increase acceleration time, avoid restarting after stopping, check power supply line, select Variable Frequency Drive with higher power rating, select appropriate motor
-
-Error Code 13: SPI - Phase Loss on Input Side
-
-Description: One or more input phases missing or severely unbalanced
-Cause: Phase loss or violent fluctuation in R, S, T input terminals
-Solution: Check input power connections, verify installation and distribution system
-
-Error Code 14: SPO - Phase Loss on Output Side
-
-Description: One or more output phases missing or motor phases asymmetrical
-Cause: Phase loss in U, V, W output terminals or three motor phases asymmetrical
-Solution: Check output distribution connections, inspect motor and cables
-
-Error Code 15: OH1 - Rectifier Module Overheat
-
-Description: Rectifier module temperature exceeded safe operating limit
-Cause: Air duct blocked or fan damaged, ambient temperature too high, overload running time too long
-Solution: Clear ventilation duct or replace fan, lower ambient temperature, reduce load or operating time
-
-Error Code 16: OH2 - Inverter Module Overheat
-
-Description: Inverter module temperature exceeded safe operating limit
-Cause: Air duct blocked or fan damaged, ambient temperature too high, overload running time too long
-Solution: Clear ventilation duct or replace fan, lower ambient temperature, reduce load or operating time
-
-Error Code 17: EF - External Fault
-
-Description: External fault signal received through input terminal
-Cause: External fault input terminal activated
-Solution: Check external device input and resolve external fault condition
-
-Error Code 18: CE - 485 Communication Fault
-
-Description: RS-485 serial communication failure
-Cause: Incorrect baud rate setting, communication wiring fault, wrong communication address, strong communication interference
-Solution: Set proper baud rate, check communication connection wiring, set proper communication address, replace wiring or improve anti-interference capability
-
-Error Code 19: ItE - Current Detection Fault
-
-Description: Current measurement circuit malfunction
-Cause: Control panel connector poor contact, exception in amplifying circuit
-Solution: Check connector and re-plug, replace main control panel
-
-Error Code 20: tE - Motor Autotuning Fault
-
-Description: Motor parameter identification process failed
-Cause: Motor capacity incompatible with Variable Frequency Drive capability, motor rated parameters set incorrectly, large offset between autotuning parameters and standard parameters, autotuning timeout
-Solution: Change Variable Frequency Drive mode, set rated parameters according to motor nameplate, remove motor load, check motor connections and parameters, verify upper limit frequency above two-thirds of rated frequency
-
-Error Code 21: EEP - Electrically Erasable Programmable Read-Only Memory Operation Fault
-
-Description: Memory read/write operation failure
-Cause: Error controlling parameter read/write operations, damaged memory chip
-Solution: Press STOP/RST to reset, replace main control panel
-
-Error Code 22: PIDE - Proportional-Integral-Derivative Feedback Offline Fault
-
-Description: Process control feedback signal lost
-Cause: Proportional-Integral-Derivative feedback offline, feedback source disappeared
-Solution: Check feedback signal connections, verify feedback source
-
-Error Code 23: bCE - Braking Unit Fault
-
-Description: Braking circuit or braking components malfunction
-Cause: Braking circuit fault or damage to braking pipes, external braking resistor insufficient
-Solution: Check braking unit and replace braking components, increase braking resistor value
-
-Error Code 24: END - Running Time Reached
-
-Description: Accumulated operating time exceeded preset limit
-Cause: Actual running time exceeded internal setting
-Solution: Contact supplier to adjust running time setting
-
-Error Code 25: OL3 - Electronic Overload
-
-Description: Electronic overload protection triggered
-Cause: Variable Frequency Drive overload pre-alarm threshold reached
-Solution: Check load conditions and overload pre-alarm threshold settings
-
-Error Code 26: PCE - Keypad Communication Error
+# VFD fault code reference shared by the system prompt and the default analysis instructions.
+# Causes and solutions repeated across related codes (phases U/V/W, acceleration/deceleration/constant speed) are defined once.
+class VfdErrorCode(NamedTuple):
+    """One entry of the VFD fault code reference"""
+    code: int
+    mnemonic: str
+    name: str
+    description: str
+    cause: str
+    solution: str
+
+
+_NORMAL_CAUSE = "Normal operating condition"
+_NO_ACTION_SOLUTION = "No action required"
+_IGBT_CAUSE = "Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding"
+_IGBT_SOLUTION = "Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference"
+_OVERCURRENT_CAUSE = "Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled"
+_OVERVOLTAGE_CAUSE = "Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled"
+_OVERVOLTAGE_SOLUTION = "Check input power supply, verify deceleration time is appropriate, install braking components if needed, check related function code settings"
+_OVERHEAT_CAUSE = "Air duct blocked or fan damaged, ambient temperature too high, overload running time too long"
+_OVERHEAT_SOLUTION = "Clear ventilation duct or replace fan, lower ambient temperature, reduce load or operating time"
+_KEYPAD_CAUSE = "Keypad not properly connected or offline, keypad cable too long with strong interference, communication circuit fault in keypad or main board"
+_GROUND_SHORT_CAUSE = "Variable Frequency Drive output shorted to ground, current detection circuit fault, large difference between actual motor power and Variable Frequency Drive power setting"
+_GROUND_SHORT_SOLUTION = "Check motor connection integrity, replace hall sensor, replace main control panel, reset correct motor parameters, verify motor power parameters match actual motor"
+
+_VFD_TABLE_INTRO = "This table provides comprehensive error code information for Variable Frequency Drive (VFD) faults in solar-powered water pumping systems."
+_VFD_CODE_FORMAT = "Error Code {code}: {heading}\n\nDescription: {description}\nCause: {cause}\nSolution: {solution}"
+
+_VFD_CODES = (
+    VfdErrorCode(0, "", "No Fault",
+                 "System operating normally with no detected faults",
+                 _NORMAL_CAUSE,
+                 _NO_ACTION_SOLUTION),
+    VfdErrorCode(9999, "", "No Fault",
+                 "System operating normally with no detected faults",
+                 _NORMAL_CAUSE,
+                 _NO_ACTION_SOLUTION),
+    VfdErrorCode(1, "OUt1", "Inverter Unit U Phase Protection",
+                 "Protection triggered on the U phase of the inverter unit",
+                 _IGBT_CAUSE,
+                 _IGBT_SOLUTION),
+    VfdErrorCode(2, "OUt2", "Inverter Unit V Phase Protection",
+                 "Protection triggered on the V phase of the inverter unit",
+                 _IGBT_CAUSE,
+                 _IGBT_SOLUTION),
+    VfdErrorCode(3, "OUt3", "Inverter Unit W Phase Protection",
+                 "Protection triggered on the W phase of the inverter unit",
+                 _IGBT_CAUSE,
+                 _IGBT_SOLUTION),
+    VfdErrorCode(4, "OC1", "Overcurrent During Acceleration",
+                 "Excessive current detected during motor acceleration phase",
+                 _OVERCURRENT_CAUSE,
+                 "Increase acceleration time, check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings"),
+    VfdErrorCode(5, "OC2", "Overcurrent During Deceleration",
+                 "Excessive current detected during motor deceleration phase",
+                 _OVERCURRENT_CAUSE,
+                 "Increase deceleration time, check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings"),
+    VfdErrorCode(6, "OC3", "Overcurrent During Constant Speed Running",
+                 "Excessive current detected during steady-state motor operation",
+                 _OVERCURRENT_CAUSE,
+                 "Check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings"),
+    VfdErrorCode(7, "OV1", "Overvoltage During Acceleration",
+                 "Direct current bus voltage exceeded limits during acceleration",
+                 _OVERVOLTAGE_CAUSE,
+                 _OVERVOLTAGE_SOLUTION),
+    VfdErrorCode(8, "OV2", "Overvoltage During Deceleration",
+                 "Direct current bus voltage exceeded limits during deceleration",
+                 _OVERVOLTAGE_CAUSE,
+                 _OVERVOLTAGE_SOLUTION),
+    VfdErrorCode(9, "OV3", "Overvoltage During Constant Speed Running",
+                 "Direct current bus voltage exceeded limits during steady-state operation",
+                 _OVERVOLTAGE_CAUSE,
+                 "Check input power supply, verify motor is not being driven externally, install braking components if needed, check related function code settings"),
+    VfdErrorCode(10, "UV", "Bus Undervoltage",
+                 "Direct current bus voltage below minimum operating threshold",
+                 "Power supply voltage too low",
+                 "Check input power supply line voltage and stability"),
+    VfdErrorCode(11, "OL1", "Motor Overload",
+                 "Motor drawing excessive current for extended period",
+                 "Power supply voltage too low, motor rated current setting incorrect, motor stall or load transients too strong",
+                 "Check power supply line, reset motor rated current parameters, check load conditions and adjust torque lift settings"),
+    VfdErrorCode(12, "OL2", "Variable Frequency Drive Overload",
+                 "Variable Frequency Drive operating beyond rated capacity",
+                 "Acceleration too fast, restarting rotating motor, power supply voltage too low, load too heavy, motor power too large for Variable Frequency Drive capacity",
+                 "Increase acceleration time, avoid restarting after stopping, check power supply line, select Variable Frequency Drive with higher power rating, select appropriate motor"),
+    VfdErrorCode(13, "SPI", "Phase Loss on Input Side",
+                 "One or more input phases missing or severely unbalanced",
+                 "Phase loss or violent fluctuation in R, S, T input terminals",
+                 "Check input power connections, verify installation and distribution system"),
+    VfdErrorCode(14, "SPO", "Phase Loss on Output Side",
+                 "One or more output phases missing or motor phases asymmetrical",
+                 "Phase loss in U, V, W output terminals or three motor phases asymmetrical",
+                 "Check output distribution connections, inspect motor and cables"),
+    VfdErrorCode(15, "OH1", "Rectifier Module Overheat",
+                 "Rectifier module temperature exceeded safe operating limit",
+                 _OVERHEAT_CAUSE,
+                 _OVERHEAT_SOLUTION),
+    VfdErrorCode(16, "OH2", "Inverter Module Overheat",
+                 "Inverter module temperature exceeded safe operating limit",
+                 _OVERHEAT_CAUSE,
+                 _OVERHEAT_SOLUTION),
+    VfdErrorCode(17, "EF", "External Fault",
+                 "External fault signal received through input terminal",
+                 "External fault input terminal activated",
+                 "Check external device input and resolve external fault condition"),
+    VfdErrorCode(18, "CE", "485 Communication Fault",
+                 "RS-485 serial communication failure",
+                 "Incorrect baud rate setting, communication wiring fault, wrong communication address, strong communication interference",
+                 "Set proper baud rate, check communication connection wiring, set proper communication address, replace wiring or improve anti-interference capability"),
+    VfdErrorCode(19, "ItE", "Current Detection Fault",
+                 "Current measurement circuit malfunction",
+                 "Control panel connector poor contact, exception in amplifying circuit",
+                 "Check connector and re-plug, replace main control panel"),
+    VfdErrorCode(20, "tE", "Motor Autotuning Fault",
+                 "Motor parameter identification process failed",
+                 "Motor capacity incompatible with Variable Frequency Drive capability, motor rated parameters set incorrectly, large offset between autotuning parameters and standard parameters, autotuning timeout",
+                 "Change Variable Frequency Drive mode, set rated parameters according to motor nameplate, remove motor load, check motor connections and parameters, verify upper limit frequency above two-thirds of rated frequency"),
+    VfdErrorCode(21, "EEP", "Electrically Erasable Programmable Read-Only Memory Operation Fault",
+                 "Memory read/write operation failure",
+                 "Error controlling parameter read/write operations, damaged memory chip",
+                 "Press STOP/RST to reset, replace main control panel"),
+    VfdErrorCode(22, "PIDE", "Proportional-Integral-Derivative Feedback Offline Fault",
+                 "Process control feedback signal lost",
+                 "Proportional-Integral-Derivative feedback offline, feedback source disappeared",
+                 "Check feedback signal connections, verify feedback source"),
+    VfdErrorCode(23, "bCE", "Braking Unit Fault",
+                 "Braking circuit or braking components malfunction",
+                 "Braking circuit fault or damage to braking pipes, external braking resistor insufficient",
+                 "Check braking unit and replace braking components, increase braking resistor value"),
+    VfdErrorCode(24, "END", "Running Time Reached",
+                 "Accumulated operating time exceeded preset limit",
+                 "Actual running time exceeded internal setting",
+                 "Contact supplier to adjust running time setting"),
+    VfdErrorCode(25, "OL3", "Electronic Overload",
+                 "Electronic overload protection triggered",
+                 "Variable Frequency Drive overload pre-alarm threshold reached",
+                 "Check load conditions and overload pre-alarm threshold settings"),
+    VfdErrorCode(26, "PCE", "Keypad Communication Error",
+                 "Control panel communication failure",
+                 _KEYPAD_CAUSE,
+                 "Check keypad cable connection, eliminate interference sources, replace hardware and seek maintenance service"),
+    VfdErrorCode(27, "UPE", "Parameter Upload Error",
+                 "Failed to upload parameters from Variable Frequency Drive",
+                 _KEYPAD_CAUSE,
+                 "Check environment and eliminate interference sources, replace hardware and seek maintenance service"),
+    VfdErrorCode(28, "DNE", "Parameter Download Error",
+                 "Failed to download parameters to Variable Frequency Drive",
+                 "Keypad not properly connected or offline, keypad cable too long with strong interference, data storage error in keypad",
+                 "Check environment and eliminate interference sources, replace hardware and seek maintenance service, backup data in keypad again"),
+    VfdErrorCode(32, "ETH1", "To-Ground Short-Circuit Fault 1",
+                 "Output to ground short circuit detected (first type)",
+                 _GROUND_SHORT_CAUSE,
+                 _GROUND_SHORT_SOLUTION),
+    VfdErrorCode(33, "ETH2", "To-Ground Short-Circuit Fault 2",
+                 "Output to ground short circuit detected (second type)",
+                 _GROUND_SHORT_CAUSE,
+                 _GROUND_SHORT_SOLUTION),
+    VfdErrorCode(34, "dEu", "Speed Deviation Fault",
+                 "Motor speed deviating from commanded speed beyond tolerance",
+                 "Load too heavy or stall occurred",
+                 "Check load conditions for proper sizing, increase detection time, verify control parameters are set properly"),
+    VfdErrorCode(35, "STo", "Maladjustment Fault",
+                 "System control parameters improperly configured",
+                 "Synchronous motor control parameters set improperly, autotuning parameters inaccurate, Variable Frequency Drive not connected to motor",
+                 "Check load conditions, verify control parameters are correct, increase maladjustment detection time"),
+    VfdErrorCode(36, "LL", "Electronic Underload Fault",
+                 "Motor operating below minimum load threshold",
+                 "Variable Frequency Drive underload pre-alarm threshold reached",
+                 "Check load conditions and underload pre-alarm point settings")
+)
 
-Description: Control panel communication failure
-Cause: Keypad not properly connected or offline, keypad cable too long with strong interference, communication circuit fault in keypad or main board
-Solution: Check keypad cable connection, eliminate interference sources, replace hardware and seek maintenance service
 
-Error Code 27: UPE - Parameter Upload Error
+# PumpError values that mean normal operation, and the codes that are real faults
+NORMAL_ERROR_CODES = frozenset({"", "0", "9999", "NORMAL"})
+ACTIONABLE_ERROR_CODES = frozenset(str(row.code) for row in _VFD_CODES) - NORMAL_ERROR_CODES
 
-Description: Failed to upload parameters from Variable Frequency Drive
-Cause: Keypad not properly connected or offline, keypad cable too long with strong interference, communication circuit fault in keypad or main board
-Solution: Check environment and eliminate interference sources, replace hardware and seek maintenance service
 
-Error Code 28: DNE - Parameter Download Error
+@lru_cache(maxsize=None)
+def _vfd_table() -> str:
+    """VFD error-code table as it appears in the prompts"""
+    entries = [
+        _VFD_CODE_FORMAT.format(heading=f"{row.mnemonic} - {row.name}" if row.mnemonic else row.name, **row._asdict())
+        for row in _VFD_CODES
+    ]
+    return "\n\n".join([_VFD_TABLE_INTRO] + entries)
 
-Description: Failed to download parameters to Variable Frequency Drive
-Cause: Keypad not properly connected or offline, keypad cable too long with strong interference, data storage error in keypad
-Solution: Check environment and eliminate interference sources, replace hardware and seek maintenance service, backup data in keypad again
 
-Error Code 32: ETH1 - To-Ground Short-Circuit Fault 1
+# Prompt templates live in prompts/ next to this module; {vfd_table} is filled in at load
+PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
 
-Description: Output to ground short circuit detected (first type)
-Cause: Variable Frequency Drive output shorted to ground, current detection circuit fault, large difference between actual motor power and Variable Frequency Drive power setting
-Solution: Check motor connection integrity, replace hall sensor, replace main control panel, reset correct motor parameters, verify motor power parameters match actual motor
 
-Error Code 33: ETH2 - To-Ground Short-Circuit Fault 2
+def _read_prompt(filename: str) -> str:
+    """Read a prompt file from prompts/ as-is"""
+    return (PROMPTS_DIR / filename).read_text(encoding="utf-8")
 
-Description: Output to ground short circuit detected (second type)
-Cause: Variable Frequency Drive output shorted to ground, current detection circuit fault, large difference between actual motor power and Variable Frequency Drive power setting
-Solution: Check motor connection integrity, replace hall sensor, replace main control panel, reset correct motor parameters, verify motor power parameters match actual motor
 
-Error Code 34: dEu - Speed Deviation Fault
+def _load_prompt(filename: str) -> str:
+    """Read a prompt template from prompts/ and fill in the VFD error-code table"""
+    return _read_prompt(filename).format(vfd_table=_vfd_table())
 
-Description: Motor speed deviating from commanded speed beyond tolerance
-Cause: Load too heavy or stall occurred
-Solution: Check load conditions for proper sizing, increase detection time, verify control parameters are set properly
 
-Error Code 35: STo - Maladjustment Fault
+@lru_cache(maxsize=None)
+def get_system_prompt() -> str:
+    """
+    Build the agent system prompt on first use.
+    
+    The Dextro platform context is part of it rather than of each user turn, so every request
+    starts with the same bytes and the prompt cache can reuse it across turns.
+    """
+    return f"{_load_prompt('system_prompt.txt')}\n\n{get_dextro_context()}"
 
-Description: System control parameters improperly configured
-Cause: Synchronous motor control parameters set improperly, autotuning parameters inaccurate, Variable Frequency Drive not connected to motor
-Solution: Check load conditions, verify control parameters are correct, increase maladjustment detection time
 
-Error Code 36: LL - Electronic Underload Fault
+# Measured once per process by start_system_prompt_token_count; None until (unless) that succeeds
+_system_prompt_tokens: Optional[int] = None
+_system_prompt_token_count_started = False
+_system_prompt_token_count_lock = threading.Lock()
 
-Description: Motor operating below minimum load threshold
-Cause: Variable Frequency Drive underload pre-alarm threshold reached
-Solution: Check load conditions and underload pre-alarm point settings
 
+def _count_system_prompt_tokens(claude_key: str) -> None:
+    """Measure the system prompt with Anthropic's count_tokens endpoint (one attempt, no retries)"""
+    global _system_prompt_tokens
+    import anthropic
+    
+    try:
+        client = anthropic.Anthropic(api_key=claude_key, timeout=SYSTEM_PROMPT_TOKEN_COUNT_TIMEOUT, max_retries=0)
+        probe = [{"role": "user", "content": "."}]
+        with_prompt = client.messages.count_tokens(model=CLAUDE_MODEL, system=get_system_prompt(), messages=probe)
+        without_prompt = client.messages.count_tokens(model=CLAUDE_MODEL, messages=probe)
+        _system_prompt_tokens = with_prompt.input_tokens - without_prompt.input_tokens
+    except Exception as e:
+        logger.warning("Could not count system prompt tokens: %s", e)
 
-You specialize in:
-- IoT device power consumption tracking and analysis using device_power_logs table
-- Flexible pump error code diagnosis using PumpError column with user-configurable analysis
-- Customer profile management using customer_profile table
-- Predictive maintenance and anomaly detection
-- Real-time device monitoring and alerting
-- Data visualization and comprehensive reporting
 
-Key capabilities:
-- Query device_power_logs for device performance analysis
-- Analyze PumpError patterns using configurable analysis instructions
-- Join device_power_logs with customer_profile for comprehensive insights
-- Generate predictive insights for device maintenance
-- Monitor system health across all devices
-- Create data-driven reports with proper column references
-- Apply custom analysis instructions provided by users
+def start_system_prompt_token_count(claude_key: str) -> Optional[threading.Thread]:
+    """
+    Count the system prompt tokens in a background thread, once per process.
+    
+    The prompt never changes at runtime. A failed count is not retried, so the metrics
+    display never waits on the network; it just omits the figure.
+    """
+    global _system_prompt_token_count_started
+    with _system_prompt_token_count_lock:
+        if _system_prompt_token_count_started or not claude_key:
+            return None
+        _system_prompt_token_count_started = True
+    
+    thread = threading.Thread(target=_count_system_prompt_tokens, args=(claude_key,), name="system-prompt-tokens", daemon=True)
+    thread.start()
+    return thread
 
-ANALYSIS APPROACH:
-- Use the configurable analysis instructions from user settings when available
-- Apply domain expertise while remaining flexible to user-specific requirements
-- Combine system-level intelligence with user-provided guidance
-- Always distinguish between actual errors and normal operation states
 
-Always use the correct column names as specified in the schema above and provide actionable insights based on both system intelligence and user instructions.
+def get_system_prompt_tokens() -> Optional[int]:
+    """Input tokens the system prompt adds to every request, if they have been counted"""
+    return _system_prompt_tokens
 
-CRITICAL FOR FINAL ANALYSIS: Always reference the DEFAULT_ANALYSIS_INSTRUCTIONS which contain comprehensive error code definitions. 
-These instructions correctly identify that codes "0" and "9999" are NORMAL OPERATION, not errors. 
-Use these instructions in your final analysis to provide accurate health assessments."""
 
 # Agent Configuration
-AGENT_NAME = "DextroIoTAgent"
-MAX_RETRIES = 3
-LOG_LEVEL = "INFO"
-ENABLE_DEBUG_LOGGING = os.getenv("DEBUG", "false").lower() == "true"
+AGENT_NAME: Final[str] = "DextroIoTAgent"
+MAX_RETRIES: Final[int] = 3
+LOG_LEVEL: Final[str] = "INFO"
+ENABLE_DEBUG_LOGGING = env_bool("DEBUG")
 
 # Default analysis instructions (user configurable)
-DEFAULT_ANALYSIS_INSTRUCTIONS = """
-When analyzing IoT device data and pump error codes, follow these guidelines:
-
-This table provides comprehensive error code information for Variable Frequency Drive (VFD) faults in solar-powered water pumping systems.
-
-Error Code 0: No Fault
-
-Description: System operating normally with no detected faults
-Cause: Normal operating condition
-Solution: No action required
-
-Error Code 9999: No Fault
-
-Description: System operating normally with no detected faults
-Cause: Normal operating condition
-Solution: No action required
-
-Error Code 1: OUt1 - Inverter Unit U Phase Protection
-
-Description: Protection triggered on the U phase of the inverter unit
-Cause: Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding
-Solution: Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference
-
-Error Code 2: OUt2 - Inverter Unit V Phase Protection
-
-Description: Protection triggered on the V phase of the inverter unit
-Cause: Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding
-Solution: Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference
-
-Error Code 3: OUt3 - Inverter Unit W Phase Protection
-
-Description: Protection triggered on the W phase of the inverter unit
-Cause: Acceleration is too fast, Insulated Gate Bipolar Transistor module fault, misacts caused by interference, poor connection of driving wires, improper grounding
-Solution: Increase acceleration time, replace power unit, check driving wires, inspect external equipment and eliminate interference
-
-Error Code 4: OC1 - Overcurrent During Acceleration
-
-Description: Excessive current detected during motor acceleration phase
-Cause: Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled
-Solution: Increase acceleration time, check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings
-
-Error Code 5: OC2 - Overcurrent During Deceleration
-
-Description: Excessive current detected during motor deceleration phase
-Cause: Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled
-Solution: Increase deceleration time, check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings
-
-Error Code 6: OC3 - Overcurrent During Constant Speed Running
-
-Description: Excessive current detected during steady-state motor operation
-Cause: Acceleration or deceleration too fast, grid voltage too low, Variable Frequency Drive power too low, load transients or abnormal conditions, grounding short circuit or output phase loss, strong external interference, overvoltage stall protection not enabled
-Solution: Check input power, select Variable Frequency Drive with larger power capacity, check for short circuits or rotation issues, verify output configuration, check for interference, verify related function code settings
-
-Error Code 7: OV1 - Overvoltage During Acceleration
-
-Description: Direct current bus voltage exceeded limits during acceleration
-Cause: Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled
-Solution: Check input power supply, verify deceleration time is appropriate, install braking components if needed, check related function code settings
-
-Error Code 8: OV2 - Overvoltage During Deceleration
-
-Description: Direct current bus voltage exceeded limits during deceleration
-Cause: Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled
-Solution: Check input power supply, verify deceleration time is appropriate, install braking components if needed, check related function code settings
-
-Error Code 9: OV3 - Overvoltage During Constant Speed Running
-
-Description: Direct current bus voltage exceeded limits during steady-state operation
-Cause: Abnormal input voltage, large energy feedback from motor, no braking components installed, braking energy not enabled
-Solution: Check input power supply, verify motor is not being driven externally, install braking components if needed, check related function code settings
-
-Error Code 10: UV - Bus Undervoltage
-
-Description: Direct current bus voltage below minimum operating threshold
-Cause: Power supply voltage too low
-Solution: Check input power supply line voltage and stability
-
-Error Code 11: OL1 - Motor Overload
-
-Description: Motor drawing excessive current for extended period
-Cause: Power supply voltage too low, motor rated current setting incorrect, motor stall or load transients too strong
-Solution: Check power supply line, reset motor rated current parameters, check load conditions and adjust torque lift settings
-
-Error Code 12: OL2 - Variable Frequency Drive Overload
-
-Description: Variable Frequency Drive operating beyond rated capacity
-Cause: Acceleration too fast, restarting rotating motor, power supply voltage too low, load too heavy, motor power too large for Variable Frequency Drive capacity
-Solution: Increase acceleration time, avoid restarting after stopping, check power supply line, select Variable Frequency Drive with higher power rating, select appropriate motor
-
-Error Code 13: SPI - Phase Loss on Input Side
-
-Description: One or more input phases missing or severely unbalanced
-Cause: Phase loss or violent fluctuation in R, S, T input terminals
-Solution: Check input power connections, verify installation and distribution system
-
-Error Code 14: SPO - Phase Loss on Output Side
-
-Description: One or more output phases missing or motor phases asymmetrical
-Cause: Phase loss in U, V, W output terminals or three motor phases asymmetrical
-Solution: Check output distribution connections, inspect motor and cables
-
-Error Code 15: OH1 - Rectifier Module Overheat
-
-Description: Rectifier module temperature exceeded safe operating limit
-Cause: Air duct blocked or fan damaged, ambient temperature too high, overload running time too long
-Solution: Clear ventilation duct or replace fan, lower ambient temperature, reduce load or operating time
-
-Error Code 16: OH2 - Inverter Module Overheat
-
-Description: Inverter module temperature exceeded safe operating limit
-Cause: Air duct blocked or fan damaged, ambient temperature too high, overload running time too long
-Solution: Clear ventilation duct or replace fan, lower ambient temperature, reduce load or operating time
-
-Error Code 17: EF - External Fault
-
-Description: External fault signal received through input terminal
-Cause: External fault input terminal activated
-Solution: Check external device input and resolve external fault condition
-
-Error Code 18: CE - 485 Communication Fault
-
-Description: RS-485 serial communication failure
-Cause: Incorrect baud rate setting, communication wiring fault, wrong communication address, strong communication interference
-Solution: Set proper baud rate, check communication connection wiring, set proper communication address, replace wiring or improve anti-interference capability
-
-Error Code 19: ItE - Current Detection Fault
-
-Description: Current measurement circuit malfunction
-Cause: Control panel connector poor contact, exception in amplifying circuit
-Solution: Check connector and re-plug, replace main control panel
-
-Error Code 20: tE - Motor Autotuning Fault
-
-Description: Motor parameter identification process failed
-Cause: Motor capacity incompatible with Variable Frequency Drive capability, motor rated parameters set incorrectly, large offset between autotuning parameters and standard parameters, autotuning timeout
-Solution: Change Variable Frequency Drive mode, set rated parameters according to motor nameplate, remove motor load, check motor connections and parameters, verify upper limit frequency above two-thirds of rated frequency
-
-Error Code 21: EEP - Electrically Erasable Programmable Read-Only Memory Operation Fault
-
-Description: Memory read/write operation failure
-Cause: Error controlling parameter read/write operations, damaged memory chip
-Solution: Press STOP/RST to reset, replace main control panel
-
-Error Code 22: PIDE - Proportional-Integral-Derivative Feedback Offline Fault
-
-Description: Process control feedback signal lost
-Cause: Proportional-Integral-Derivative feedback offline, feedback source disappeared
-Solution: Check feedback signal connections, verify feedback source
-
-Error Code 23: bCE - Braking Unit Fault
-
-Description: Braking circuit or braking components malfunction
-Cause: Braking circuit fault or damage to braking pipes, external braking resistor insufficient
-Solution: Check braking unit and replace braking components, increase braking resistor value
-
-Error Code 24: END - Running Time Reached
-
-Description: Accumulated operating time exceeded preset limit
-Cause: Actual running time exceeded internal setting
-Solution: Contact supplier to adjust running time setting
-
-Error Code 25: OL3 - Electronic Overload
-
-Description: Electronic overload protection triggered
-Cause: Variable Frequency Drive overload pre-alarm threshold reached
-Solution: Check load conditions and overload pre-alarm threshold settings
-
-Error Code 26: PCE - Keypad Communication Error
-
-Description: Control panel communication failure
-Cause: Keypad not properly connected or offline, keypad cable too long with strong interference, communication circuit fault in keypad or main board
-Solution: Check keypad cable connection, eliminate interference sources, replace hardware and seek maintenance service
-
-Error Code 27: UPE - Parameter Upload Error
-
-Description: Failed to upload parameters from Variable Frequency Drive
-Cause: Keypad not properly connected or offline, keypad cable too long with strong interference, communication circuit fault in keypad or main board
-Solution: Check environment and eliminate interference sources, replace hardware and seek maintenance service
-
-Error Code 28: DNE - Parameter Download Error
-
-Description: Failed to download parameters to Variable Frequency Drive
-Cause: Keypad not properly connected or offline, keypad cable too long with strong interference, data storage error in keypad
-Solution: Check environment and eliminate interference sources, replace hardware and seek maintenance service, backup data in keypad again
-
-Error Code 32: ETH1 - To-Ground Short-Circuit Fault 1
-
-Description: Output to ground short circuit detected (first type)
-Cause: Variable Frequency Drive output shorted to ground, current detection circuit fault, large difference between actual motor power and Variable Frequency Drive power setting
-Solution: Check motor connection integrity, replace hall sensor, replace main control panel, reset correct motor parameters, verify motor power parameters match actual motor
-
-Error Code 33: ETH2 - To-Ground Short-Circuit Fault 2
-
-Description: Output to ground short circuit detected (second type)
-Cause: Variable Frequency Drive output shorted to ground, current detection circuit fault, large difference between actual motor power and Variable Frequency Drive power setting
-Solution: Check motor connection integrity, replace hall sensor, replace main control panel, reset correct motor parameters, verify motor power parameters match actual motor
-
-Error Code 34: dEu - Speed Deviation Fault
-
-Description: Motor speed deviating from commanded speed beyond tolerance
-Cause: Load too heavy or stall occurred
-Solution: Check load conditions for proper sizing, increase detection time, verify control parameters are set properly
-
-Error Code 35: STo - Maladjustment Fault
-
-Description: System control parameters improperly configured
-Cause: Synchronous motor control parameters set improperly, autotuning parameters inaccurate, Variable Frequency Drive not connected to motor
-Solution: Check load conditions, verify control parameters are correct, increase maladjustment detection time
-
-Error Code 36: LL - Electronic Underload Fault
-
-Description: Motor operating below minimum load threshold
-Cause: Variable Frequency Drive underload pre-alarm threshold reached
-Solution: Check load conditions and underload pre-alarm point settings
-GENERAL ANALYSIS:
-- Focus on operational efficiency and preventive maintenance
-- Identify patterns that could indicate upcoming failures
-- Prioritize safety-critical issues over minor operational concerns
-- Consider environmental factors (temperature, power fluctuations) in analysis
-
-ERROR CODE INTERPRETATION:
-- Treat error codes contextually based on frequency and device history
-- Look for recurring error patterns that might indicate systemic issues
-- Consider the operational environment when assessing error severity
-
-RECOMMENDATIONS:
-- Provide actionable maintenance recommendations
-- Include both immediate actions and long-term preventive measures  
-- Consider cost-effectiveness of recommended actions
-- Prioritize recommendations based on safety and operational impact
-
-REPORTING:
-- Present findings in clear, business-friendly language
-- Include relevant metrics and trends
-- Highlight critical issues that require immediate attention
-- Provide context for technical staff and management decisions
-"""
+DEFAULT_ANALYSIS_INSTRUCTIONS = _load_prompt("analysis_instructions.txt")
+
+# Instruction templates offered in the Settings tab (display name -> prompts/templates/ file)
+ANALYSIS_TEMPLATES = types.MappingProxyType({
+    name: _read_prompt(f"templates/{filename}")
+    for name, filename in (
+        ("Maintenance-Focused", "maintenance_focused.txt"),
+        ("Performance Optimization", "performance_optimization.txt"),
+        ("Safety-Critical", "safety_critical.txt"),
+    )
+})
 
 # Import callback handler and tools from new modules
-from callback_handler import CaptureCallbackHandler
+from callback_handler import CaptureCallbackHandler, TokenUsage
 from agentic_tools import (
     get_all_tools,
-    get_device_power_data,
-    get_customer_device_info
+    DEVICE_POWER_DATA_LIMIT,
+    get_customer_device_info,
+    extract_device_id,
+    clear_customer_profile_cache,
+    start_rpc_prewarm
 )
 
-# Check if Strands is available
-try:
-    from strands import Agent, tool
-    from strands.models.anthropic import AnthropicModel
-    from strands.handlers.callback_handler import PrintingCallbackHandler
-    STRANDS_AVAILABLE = True
-except ImportError:
-    STRANDS_AVAILABLE = False
+# Check if the Strands SDK and its Anthropic provider (the anthropic package) can be loaded, without importing them yet
+STRANDS_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("strands", "anthropic"))
 
 
 # =============================================================================
@@ -616,19 +356,22 @@ def setup_logging():
     """Configure comprehensive logging for the Dextro agent"""
     log_format = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
     
+    handlers = [logging.StreamHandler()]
+    if ENABLE_DEBUG_LOGGING:
+        # Only debug runs write the log file; app workers would otherwise all append to it
+        handlers.append(logging.FileHandler("dextro_agent.log", mode="a"))
+    
     logging.basicConfig(
         level=getattr(logging, LOG_LEVEL),
         format=log_format,
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler("dextro_agent.log", mode="a")
-        ]
+        handlers=handlers
     )
     
     # Configure specific loggers
     if ENABLE_DEBUG_LOGGING:
         logging.getLogger("strands").setLevel(logging.DEBUG)
         logging.getLogger("supabase").setLevel(logging.DEBUG)
+        logging.getLogger("callback_handler").setLevel(logging.DEBUG)
     
     return logging.getLogger(__name__)
 
@@ -640,52 +383,51 @@ logger = setup_logging()
 
 def _extract_tool_results_from_callback(agent):
     """Extract tool results from the agent's callback handler"""
-    tool_results = []
-    
-    if hasattr(agent, '_callback_handler'):
-        callback = agent._callback_handler
-        if hasattr(callback, 'tool_results'):
-            tool_results = callback.tool_results
-            logger.info(f"Extracted {len(tool_results)} tool results from callback handler")
-        else:
-            logger.warning("Callback handler found but no tool_results attribute")
-    else:
-        logger.warning("No callback handler found")
-    
-    return tool_results
+    try:
+        return agent.callback_handler.tool_results
+    except AttributeError:
+        # Handler that doesn't capture tool results (e.g. a custom handler passed to the Agent)
+        return []
+
+def _read_accumulated_usage(response) -> TokenUsage:
+    """Token usage from a Strands AgentResult (metrics.accumulated_usage)"""
+    usage = response.metrics.accumulated_usage
+    return TokenUsage(
+        usage.get('inputTokens', 0),
+        usage.get('outputTokens', 0),
+        usage.get('totalTokens', 0)
+    )
 
-def _extract_token_usage_from_response(response):
-    """Extract token usage from Strands agent response with comprehensive debugging"""
-    token_usage = None
-    
-    logger.info(f"Looking for token usage in response: {type(response)}")
-    
-    # Try multiple possible attribute names for token usage
-    possible_attrs = ['token_usage', 'tokens', 'usage', 'metrics']
+def _read_token_usage_attr(response) -> TokenUsage:
+    """Token usage from response objects that carry a token_usage attribute instead"""
+    token_usage = response.token_usage
+    return TokenUsage(
+        getattr(token_usage, 'input_tokens', getattr(token_usage, 'prompt_tokens', 0)),
+        getattr(token_usage, 'output_tokens', getattr(token_usage, 'completion_tokens', 0)),
+        getattr(token_usage, 'total_tokens', 0)
+    )
+
+# Response type -> reader that worked for it; the shape of a response class never changes
+_USAGE_READERS: Dict[type, Callable[[Any], TokenUsage]] = {}
+
+def _extract_token_usage_from_response(response) -> Optional[TokenUsage]:
+    """Extract token usage from a Strands agent response"""
+    reader = _USAGE_READERS.get(type(response))
+    if reader is not None:
+        return reader(response)
     
-    for attr in possible_attrs:
-        if hasattr(response, attr):
-            attr_value = getattr(response, attr)
-            logger.info(f"Found attribute '{attr}': {type(attr_value)} = {attr_value}")
-            
-            if attr == 'token_usage' and attr_value:
-                token_usage = {
-                    "input_tokens": getattr(attr_value, 'input_tokens', getattr(attr_value, 'prompt_tokens', 0)),
-                    "output_tokens": getattr(attr_value, 'output_tokens', getattr(attr_value, 'completion_tokens', 0)),
-                    "total_tokens": getattr(attr_value, 'total_tokens', 0)
-                }
-                break
-            elif attr == 'metrics' and hasattr(attr_value, 'accumulated_usage'):
-                usage = attr_value.accumulated_usage
-                token_usage = {
-                    "input_tokens": usage.get('inputTokens', usage.get('input_tokens', 0)),
-                    "output_tokens": usage.get('outputTokens', usage.get('output_tokens', 0)),
-                    "total_tokens": usage.get('totalTokens', usage.get('total_tokens', 0))
-                }
-                break
+    # First response of this type: find where it keeps usage and remember it
+    if getattr(getattr(response, 'metrics', None), 'accumulated_usage', None) is not None:
+        reader = _read_accumulated_usage
+    elif getattr(response, 'token_usage', None):
+        reader = _read_token_usage_attr
+    else:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("No token usage found on response of type %s", type(response))
+        return None
     
-    logger.info(f"Extracted token usage: {token_usage}")
-    return token_usage
+    _USAGE_READERS[type(response)] = reader
+    return reader(response)
 
 # =============================================================================
 # SUPABASE CONNECTION MANAGEMENT
@@ -701,66 +443,141 @@ class DextroSupabaseManager:
         self.url = url
         self.key = key
         self._client = None
+        # Guards building/dropping the client so concurrent first use creates one pool, not several
+        self._lock = threading.Lock()
         self.logger = logging.getLogger(f"{__name__}.supabase")
     
     @property
-    def client(self) -> Client:
+    def client(self) -> "Client":
         """Lazy initialization of Supabase client"""
-        if self._client is None:
+        client = self._client
+        if client is not None:
+            return client
+        
+        with self._lock:
+            if self._client is not None:
+                return self._client
             try:
-                self._client = create_client(self.url, self.key)
+                from supabase import create_client, ClientOptions
+                
+                # One pooled HTTP/2 keep-alive connection set shared by every tool call and every
+                # sub-client (postgrest, storage, functions, auth); failed connects are retried
+                transport = httpx.HTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY
+                    ),
+                    retries=CONNECT_RETRIES
+                )
+                http_client = httpx.Client(
+                    transport=transport,
+                    timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                    follow_redirects=True
+                )
+                self._client = create_client(self.url, self.key, options=ClientOptions(httpx_client=http_client))
                 self.logger.info("Dextro Supabase client initialized successfully")
             except Exception as e:
-                self.logger.error(f"Failed to initialize Supabase client: {e}")
+                self.logger.error("Failed to initialize Supabase client: %s", e)
                 raise
-        return self._client
+            return self._client
+    
+    @staticmethod
+    def is_connection_error(error: Exception) -> bool:
+        """True for transport failures (timeouts, resets, broken HTTP/2 streams) a new connection can fix"""
+        return isinstance(error, httpx.TransportError)
+    
+    @staticmethod
+    def is_transient_api_error(error: PostgrestAPIError) -> bool:
+        """True for PostgREST errors a later attempt can succeed on; anything else fails the same way again"""
+        return str(error.code) in TRANSIENT_POSTGREST_CODES or "too many requests" in str(error).lower()
+    
+    def force_reconnect(self) -> None:
+        """Drop the client so the next .client access builds a fresh connection pool"""
+        # The old pool isn't closed here: other threads may still have requests in flight on it
+        with self._lock:
+            self._client = None
+        # Profiles cached from the old connection may not match the database we reconnect to
+        clear_customer_profile_cache()
+        self.logger.warning("Supabase connection reset - reconnecting on next request")
+    
+    def _backoff(self, attempt: int) -> None:
+        """Exponential backoff before the next attempt"""
+        time.sleep(min(RETRY_BACKOFF_INITIAL_SECONDS * 2 ** attempt, RETRY_BACKOFF_MAX_SECONDS))
+    
+    def _unwrap(self, result):
+        """Rows from a successful response, or an error dict"""
+        if hasattr(result, 'data') and result.data is not None:
+            return result.data
+        elif hasattr(result, 'error') and result.error:
+            self.logger.error("Supabase operation error: %s", result.error)
+            return {"error": str(result.error)}
+        else:
+            return result
+    
+    def _api_error(self, error: PostgrestAPIError):
+        """Final result for a PostgREST error that won't be retried"""
+        # PGRST116: no rows for a single-row request; 42501: Postgres insufficient_privilege
+        if error.code == "PGRST116":
+            self.logger.info("No data found for query")
+            return []
+        elif error.code == "42501":
+            self.logger.warning("Permission denied")
+            return {"error": "Insufficient permissions to access this data"}
+        else:
+            self.logger.error("Supabase API error: %s", error)
+            return {"error": f"Database operation failed: {error}"}
+    
+    def execute_once(self, operation):
+        """Execute a Supabase operation a single time, with the same result/error handling as execute_with_retry"""
+        try:
+            return self._unwrap(operation())
+        except PostgrestAPIError as e:
+            return self._api_error(e)
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
+            if self.is_connection_error(e):
+                self.force_reconnect()
+            return {"error": f"Operation failed: {e}"}
     
     def execute_with_retry(self, operation, max_retries: int = MAX_RETRIES):
         """Execute Supabase operations with retry logic"""
+        if max_retries <= 1:
+            return self.execute_once(operation)
+        
         last_exception = None
         
         for attempt in range(max_retries):
             try:
-                result = operation()
-                
-                if hasattr(result, 'data') and result.data is not None:
-                    return result.data
-                elif hasattr(result, 'error') and result.error:
-                    self.logger.error(f"Supabase operation error: {result.error}")
-                    return {"error": str(result.error)}
-                else:
-                    return result
+                return self._unwrap(operation())
                     
             except PostgrestAPIError as e:
                 last_exception = e
-                error_message = str(e).lower()
                 
-                if "no rows" in error_message or "pgrst116" in error_message:
-                    self.logger.info("No data found for query")
-                    return []
-                elif "permission denied" in error_message:
-                    self.logger.warning("Permission denied")
-                    return {"error": "Insufficient permissions to access this data"}
-                elif attempt < max_retries - 1:
-                    self.logger.warning(f"Retrying operation... (attempt {attempt + 1})")
-                    continue
-                else:
-                    self.logger.error(f"Supabase API error: {e}")
-                    return {"error": f"Database operation failed: {e}"}
+                # Deterministic errors (bad input, missing function, permissions) are not retried
+                if not self.is_transient_api_error(e) or attempt == max_retries - 1:
+                    return self._api_error(e)
+                self.logger.warning("Retrying operation... (attempt %s)", attempt + 1)
+                self._backoff(attempt)
                     
             except Exception as e:
                 last_exception = e
-                self.logger.error(f"Unexpected error: {e}")
-                if attempt < max_retries - 1:
-                    continue
-                else:
+                self.logger.error("Unexpected error: %s", e)
+                # Only transport failures are retried, on a fresh connection
+                if not self.is_connection_error(e):
+                    return {"error": f"Operation failed: {e}"}
+                if attempt == max_retries - 1:
                     return {"error": f"Operation failed after {max_retries} attempts: {e}"}
+                self.force_reconnect()
+                self._backoff(attempt)
         
         return {"error": f"Operation failed after {max_retries} attempts: {last_exception}"}
 
 # Initialize global Supabase manager (only if credentials are available)
 if SUPABASE_URL and SUPABASE_KEY:
     supabase_manager = DextroSupabaseManager(SUPABASE_URL, SUPABASE_KEY)
+    start_rpc_prewarm()
 else:
     supabase_manager = None
 
@@ -772,25 +589,41 @@ else:
 # AGENT CONFIGURATION AND ORCHESTRATION
 # =============================================================================
 
-def create_anthropic_model(claude_key=None) -> AnthropicModel:
-    """Configure Anthropic model for Claude integration"""
-    
-    claude_key = claude_key or CLAUDE_KEY
-    if not claude_key:
-        raise ValueError("CLAUDE_KEY is required")
+@st.cache_resource(show_spinner=False)
+def _cached_anthropic_model(claude_key: str, model_id: str, max_tokens: int, temperature: float) -> "AnthropicModel":
+    """One AnthropicModel (and its HTTP client) per key/model settings, shared across agent inits"""
+    from strands.models import CacheConfig
+    from strands.models.anthropic import AnthropicModel
     
     model = AnthropicModel(
         client_args={"api_key": claude_key},
-        model_id=CLAUDE_MODEL,
-        max_tokens=MAX_TOKENS,
+        model_id=model_id,
+        max_tokens=max_tokens,
         params={
-            "temperature": TEMPERATURE
-        }
+            "temperature": temperature
+        },
+        # Prompt caching: the tool definitions and the large static system prompt are the same on
+        # every request, so they are marked cacheable and billed/processed as cache reads after the first
+        cache_config=CacheConfig(strategy="anthropic", tools_ttl=True)
     )
     
-    logger.info(f"Anthropic model configured: {CLAUDE_MODEL}")
+    logger.info("Anthropic model configured: %s", model_id)
     return model
 
+@st.cache_resource(show_spinner=False)
+def _cached_tools() -> tuple:
+    """Tool registry for the agent, built once per process"""
+    return tuple(get_all_tools())
+
+def create_anthropic_model(claude_key=None) -> "AnthropicModel":
+    """Configure Anthropic model for Claude integration"""
+    
+    claude_key = claude_key or CLAUDE_KEY
+    if not claude_key:
+        raise ValueError("CLAUDE_KEY is required")
+    
+    return _cached_anthropic_model(claude_key, CLAUDE_MODEL, MAX_TOKENS, TEMPERATURE)
+
 def validate_configuration(claude_key=None, supabase_url=None, supabase_key=None):
     """Validate all required configuration is present"""
     missing_config = []
@@ -818,9 +651,14 @@ def validate_configuration(claude_key=None, supabase_url=None, supabase_key=None
 # STREAMLIT INTEGRATION FUNCTIONS
 # =============================================================================
 
-@st.cache_resource
 def init_claude_agent(supabase_url: str = None, supabase_key: str = None, claude_key: str = None):
-    """Initialize the Dextro IoT Agent for Streamlit integration"""
+    """
+    Initialize the Dextro IoT Agent for Streamlit integration.
+    
+    Each call builds a new Agent: its conversation and callback capture state belong to one
+    chat session, so the app keeps one per session. The model client and tools are shared
+    through their own caches, so this is cheap.
+    """
     # Use provided values or fall back to configured values
     supabase_url = supabase_url or SUPABASE_URL
     supabase_key = supabase_key or SUPABASE_KEY
@@ -845,20 +683,26 @@ def init_claude_agent(supabase_url: str = None, supabase_key: str = None, claude
         
         # Get tools from the agentic_tools module
         logger.info("Preparing tools...")
-        tools = get_all_tools()
-        logger.info(f"Created {len(tools)} tools for agent")
+        tools = list(_cached_tools())
+        logger.info("Created %s tools for agent", len(tools))
+        
+        from strands import Agent
         
-        # Create agent with PrintingCallbackHandler for now (better debugging)
-        logger.info("Initializing Strands Agent with PrintingCallbackHandler...")
+        # Capture events for the Streamlit console, tool results and charts; with DEBUG set the
+        # handler also writes each event to the log
+        callback_handler = CaptureCallbackHandler()
+        logger.info("Initializing Strands Agent with %s...", type(callback_handler).__name__)
         agent = Agent(
             model=model,
-            system_prompt=SYSTEM_PROMPT,
+            system_prompt=get_system_prompt(),
             tools=tools,
-            callback_handler=PrintingCallbackHandler(),
+            callback_handler=callback_handler,
             name=AGENT_NAME
         )
         
-        logger.info(f"Dextro IoT agent initialized successfully")
+        start_system_prompt_token_count(claude_key)
+        
+        logger.info("Dextro IoT agent initialized successfully")
         return agent
         
     except Exception as e:
@@ -869,189 +713,291 @@ def init_claude_agent(supabase_url: str = None, supabase_key: str = None, claude
             st.error(f"❌ Error initializing AI agent: {str(e)}")
         return None
 
+def _reset_callback_handler(agent) -> None:
+    """Per-query capture state; without this tool results accumulate across the session"""
+    reset_handler = getattr(agent.callback_handler, 'reset', None)
+    if reset_handler is not None:
+        reset_handler()
+    # An error chart belongs to the query whose tool produced it, not to later answers
+    ss = getattr(st, 'session_state', None)
+    if ss is not None:
+        ss.pop('last_error_analysis', None)
+
+def _record_query_results(agent, response) -> None:
+    """Store tool results and token usage of a finished query in session state and display them"""
+    # Extract tool results and token usage from callback handler
+    tool_results = _extract_tool_results_from_callback(agent)
+    token_usage = getattr(agent.callback_handler, 'token_usage', None)
+    if token_usage is None:
+        token_usage = _extract_token_usage_from_response(response)
+    
+    # Store results in session state for Streamlit display (by reference; reset() rebinds the handler's list)
+    if hasattr(st, 'session_state'):
+        st.session_state.tool_usage = tool_results
+        if token_usage:
+            st.session_state.last_token_usage = token_usage
+        
+        logger.info("Stored %s tool results and token usage in session", len(tool_results))
+        
+        # Display metrics in Streamlit
+        _display_agent_metrics(token_usage, tool_results)
+
+def _response_text(response) -> str:
+    """The final assistant answer: text blocks of the last message, without tool traces or metadata"""
+    message = getattr(response, 'message', None)
+    if not isinstance(message, dict):
+        return str(response)
+    return "\n".join(
+        block["text"] for block in message.get("content", [])
+        if isinstance(block, dict) and "text" in block
+    )
+
 def query_claude_agent(agent, question: str):
     """Query the Dextro IoT agent with official Strands response handling"""
     try:
         if not agent:
             return "❌ Dextro AI Agent not initialized"
         
-        logger.info(f"Processing query: {question[:100]}...")
+        logger.info("Processing query: %s...", question[:100])
+        _reset_callback_handler(agent)
         
         # Process the query
         response = agent(question)
         
         logger.info("Query completed, extracting results...")
+        _record_query_results(agent, response)
         
-        # Extract tool results and token usage from callback handler
-        tool_results = _extract_tool_results_from_callback(agent)
-        token_usage = None
-        if hasattr(agent, '_callback_handler') and hasattr(agent._callback_handler, 'token_usage'):
-            token_usage = agent._callback_handler.token_usage
+        return _response_text(response)
         
-        # Store results in session state for Streamlit display
-        if hasattr(st, 'session_state'):
-            st.session_state.tool_usage = tool_results
-            if token_usage:
-                st.session_state.last_token_usage = token_usage
-            
-            logger.info(f"Stored {len(tool_results)} tool results and token usage in session")
+    except Exception as e:
+        logger.error("Error querying Dextro agent: %s", e)
+        return f"❌ Error processing request: {str(e)}"
+
+async def aquery_claude_agent(agent, question: str):
+    """
+    Async query_claude_agent: awaits the agent on the caller's event loop instead of blocking a thread.
+    
+    Tool calls requested in the same model turn already run concurrently (Strands' default
+    ConcurrentToolExecutor, sync tools in worker threads), so a turn costs its slowest call.
+    """
+    try:
+        if not agent:
+            return "❌ Dextro AI Agent not initialized"
         
-        # Get response text
-        response_text = str(response)
+        logger.info("Processing query: %s...", question[:100])
+        _reset_callback_handler(agent)
         
-        # Display metrics in Streamlit
-        if hasattr(st, 'session_state'):
-            _display_agent_metrics(token_usage, tool_results)
+        response = await agent.invoke_async(question)
+        
+        logger.info("Query completed, extracting results...")
+        _record_query_results(agent, response)
         
-        return response_text
+        return _response_text(response)
         
     except Exception as e:
-        logger.error(f"Error querying Dextro agent: {e}")
+        logger.error("Error querying Dextro agent: %s", e)
         return f"❌ Error processing request: {str(e)}"
 
+def _history_to_messages(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chat history ({"role", "content"} dicts) as Strands messages, replayed verbatim each turn"""
+    messages = [
+        {"role": message["role"], "content": [{"text": message["content"]}]}
+        for message in history
+        if message.get("content")
+    ]
+    # The conversation sent to Claude has to open with a user turn (drops the greeting)
+    while messages and messages[0]["role"] != "user":
+        messages.pop(0)
+    return messages
+
+def query_claude_agent_stream(agent, question: str, history: Optional[List[Dict[str, Any]]] = None) -> Iterator[str]:
+    """
+    Query the Dextro IoT agent, yielding response text as the model streams it.
+    
+    Made for st.write_stream: the first tokens render while the rest is still being generated.
+    Tool results and token usage are recorded the same way as query_claude_agent once the run ends.
+    
+    history is the earlier chat ({"role", "content"} dicts, oldest first). It is replayed
+    unchanged before the question, so the prompt prefix of each turn is a cache hit.
+    """
+    if not agent:
+        yield "❌ Dextro AI Agent not initialized"
+        return
+    
+    logger.info("Processing streamed query: %s...", question[:100])
+    _reset_callback_handler(agent)
+    if history is not None:
+        agent.messages = _history_to_messages(history)
+    
+    # Strands streams through an async iterator; drive it from this (synchronous) script thread
+    loop = asyncio.new_event_loop()
+    events = agent.stream_async(question)
+    response = None
+    # Text of a model message that follows a tool cycle starts a new paragraph, so narration
+    # before a tool call ("I'll check the logs.") doesn't run into the answer
+    streamed_text = False
+    new_message = False
+    try:
+        while True:
+            try:
+                event = loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                break
+            if "data" in event:
+                if new_message:
+                    yield "\n\n"
+                    new_message = False
+                streamed_text = True
+                yield event["data"]
+            elif "message" in event:
+                new_message = streamed_text
+            elif "result" in event:
+                response = event["result"]
+    except Exception as e:
+        logger.error("Error querying Dextro agent: %s", e)
+        yield f"\n\n❌ Error processing request: {str(e)}"
+        return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
+    
+    logger.info("Query completed, extracting results...")
+    _record_query_results(agent, response)
+
 def _display_agent_metrics(token_usage, tool_results):
     """Display agent metrics including token usage and tool results"""
-    if not hasattr(st, 'session_state'):
+    ss = getattr(st, 'session_state', None)
+    if ss is None:
         return
     
     # Display agent console logs
-    if hasattr(st.session_state, 'agent_console_logs') and st.session_state.agent_console_logs:
+    console_logs = ss.get('agent_console_logs')
+    if console_logs:
         with st.expander("🖥️ Agent Console", expanded=False):
-            for log_entry in st.session_state.agent_console_logs[-20:]:  # Show last 20 entries
-                st.code(log_entry, language="text")
+            # Last 20 entries, sent to the browser as one element
+            st.code("\n".join(console_logs[-20:]), language="text")
     
     # Display token usage
     if token_usage:
         with st.expander("📊 Token Usage", expanded=False):
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Input Tokens", f"{token_usage['input_tokens']:,}")
+                st.metric("Input Tokens", f"{token_usage.input_tokens:,}")
             with col2:
-                st.metric("Output Tokens", f"{token_usage['output_tokens']:,}")
+                st.metric("Output Tokens", f"{token_usage.output_tokens:,}")
             with col3:
-                st.metric("Total Tokens", f"{token_usage['total_tokens']:,}")
+                st.metric("Total Tokens", f"{token_usage.total_tokens:,}")
+            system_prompt_tokens = get_system_prompt_tokens()
+            if system_prompt_tokens is not None:
+                st.caption(f"System prompt: {system_prompt_tokens:,} of the input tokens on every request")
     
     # Display tool results
-    if tool_results and len(tool_results) > 0:
+    if tool_results:
         with st.expander(f"🔧 Tool Results ({len(tool_results)} tools used)", expanded=False):
+            # One markdown block and one JSON tree for all tools instead of several elements per tool
+            summary_lines = []
+            details = {}
             for i, tool_usage in enumerate(tool_results):
-                st.markdown(f"**Tool {i+1}: {tool_usage.get('tool_name', 'unknown')}** (Sequence {tool_usage.get('sequence', 'unknown')})")
-                st.markdown(f"*Timestamp:* {tool_usage.get('timestamp', 'unknown')}")
-                st.markdown(f"*Tool Use ID:* {tool_usage.get('tool_use_id', 'unknown')}")
-                
-                # Show tool input/query
-                if tool_usage.get('input'):
-                    st.markdown("*Input/Query:*")
-                    st.json(tool_usage['input'])
-                
-                # Show tool output
-                if tool_usage.get('output'):
-                    st.markdown("*Output:*")
-                    st.json(tool_usage['output'])
-                
-                # Show token metadata if available
-                if tool_usage.get('token_metadata'):
-                    st.markdown("*Token Metadata:*")
-                    st.json(tool_usage['token_metadata'])
-                
-                if i < len(tool_results) - 1:
-                    st.markdown("---")
+                label = f"Tool {i+1}: {tool_usage.get('tool_name', 'unknown')}"
+                summary_lines.append(
+                    f"- **{label}** (Sequence {tool_usage.get('sequence', 'unknown')}) · "
+                    f"*Timestamp:* {tool_usage.get('timestamp', 'unknown')} · "
+                    f"*Tool Use ID:* {tool_usage.get('tool_use_id', 'unknown')}"
+                )
+                details[label] = {
+                    section: tool_usage[key]
+                    for section, key in (("Input/Query", 'input'), ("Output", 'output'), ("Token Metadata", 'token_metadata'))
+                    if tool_usage.get(key)
+                }
+            
+            st.markdown("\n".join(summary_lines))
+            st.json(details)
     else:
         # Debug: show what we have in session state
-        if hasattr(st, 'session_state') and hasattr(st.session_state, 'tool_usage'):
-            if st.session_state.tool_usage:
-                with st.expander("🔧 Session Tool Results (Fallback)", expanded=False):
-                    st.json(st.session_state.tool_usage)
+        session_tool_usage = ss.get('tool_usage')
+        if session_tool_usage:
+            with st.expander("🔧 Session Tool Results (Fallback)", expanded=False):
+                st.json(session_tool_usage)
 
+@lru_cache(maxsize=None)
 def get_dextro_context():
-    """Get the enhanced context for Dextro IoT assistant"""
-    return """
-    You are an advanced IoT device monitoring assistant for the Dextro platform with comprehensive analytics capabilities.
-
-    PLATFORM SPECIALIZATION:
-    - Real-time IoT device power consumption tracking and analysis
-    - Intelligent pump error code diagnosis with actionable recommendations
-    - Customer profile management and service optimization
-    - Predictive maintenance scheduling and anomaly detection
-    - System-wide health monitoring and automated alerting
-    - Data visualization and comprehensive reporting
-
-    AVAILABLE TOOLS:
-    1. get_device_power_data(columns, device_id, date, filters): Smart device data retrieval with computed insights
-       - PRIMARY tool for device analysis - let the model specify columns and filters
-       - Provides computed analysis (error rates, power statistics, time ranges) based on selected columns
-       - Only analyzes columns that are actually retrieved (no "ghost" column errors)
-       - Examples:
-         * get_device_power_data("device_id,PumpError,CreatedOnDate", device_id=865198074539541)
-         * get_device_power_data("Power,Voltage,Current,Temperature", date="2025-08-21") 
-         * get_device_power_data("*", filters={"Location": "Mumbai", "PumpError": "!0"})
-
-    2. query_supabase_database(columns, table_name, filters, order_by, limit): Raw data queries without analysis
-       - Use for simple operations: getting unique values, basic filtering, raw data extraction
-       - NO computed insights - just returns raw records
-       - Examples:
-         * query_supabase_database("Location")  # Gets unique locations
-         * query_supabase_database("*", order_by="CreatedOnDate.desc", limit=10)  # Latest records
-
-    3. get_customer_device_info(device_id): Get customer profile and device context
-       - Links device IDs to customer information
-       - Provides location, district, and franchise context for devices
-
-    4. monitor_system_health(): Comprehensive system-wide monitoring  
-       - Analyzes health across all devices in the network
-       - Excludes normal operation codes (0, 9999) from error analysis
-
-    TOOL SELECTION GUIDANCE:
-    - Use get_device_power_data() when you need analysis, insights, or computed metrics
-    - Use query_supabase_database() for simple data retrieval, unique values, or raw records
-    - ALWAYS specify the exact columns you need - tools will only analyze what's requested
-    - Device IDs are long numbers (e.g., 865198074539541) - extract from user queries
-
-    COLUMN SELECTION STRATEGY:
-    - Be explicit about columns: "device_id,PumpError,Power" not "*" 
-    - Only request columns you'll actually use for analysis
-    - Tools perform smarter analysis when you specify exact columns needed
-    - Error analysis only works if "PumpError" column is requested
-    - Power analysis only works if "Power" column is requested
-
-    ENHANCED CAPABILITIES:
-    - Execute any SELECT query on device_power_logs and customer_profile tables
-    - Automatically extract and validate device IDs from user input
-    - Query device_power_logs table with correct column names (CreatedOnDate, PumpError, Power, etc.)
-    - Answer specific questions about error patterns, dates, locations, and frequencies
-    - Generate detailed diagnostic reports with severity assessment based on PumpError patterns
-    - Analyze device performance using Power, Voltage, Current, Temperature, and other metrics
-    - Track device runtime (TodayRunTime, TotalRunTime) and water flow (TodayLitre, TotalLitres)
-    - Monitor GSM signal strength and power consumption (Power_KWH)
-    - Perform location-based analysis across Districts and Franchises
-    - Generate business intelligence insights with automatic pattern detection
-    - Create data-driven visualizations and trend analysis
-    - Deliver actionable business intelligence for IoT operations
-
-    IMPORTANT DATABASE REMINDERS:
-    - Use CreatedOnDate (not created_on_date) for timestamps
-    - Use PumpError (not pump_error) for error codes  
-    - Use Power (not power) for power consumption data
-    - All column names are case-sensitive and follow the exact schema provided
-
-    Always provide detailed analysis, actionable insights, and explain technical findings in business terms.
-    """
+    """Get the enhanced context for Dextro IoT assistant (read once from prompts/)"""
+    return _read_prompt("dextro_context.txt")
 
 # Legacy compatibility functions (maintaining interface for existing app.py)
-def fetch_device_power_logs_with_customer(datalake: Client, device_id: int):
-    """Legacy compatibility function for existing app.py integration"""
+@st.cache_data(ttl=DEVICE_POWER_LOGS_CACHE_TTL_SECONDS, show_spinner=False)
+def _device_power_logs(device_id: int) -> List[Dict[str, Any]]:
+    """Most recent power log rows for one device; failures raise so they aren't cached"""
+    def get_device_logs():
+        return supabase_manager.client.table("device_power_logs")\
+            .select("*")\
+            .eq("device_id", device_id)\
+            .order("CreatedOnDate", desc=True)\
+            .limit(DEVICE_POWER_DATA_LIMIT)\
+            .execute()
+    
+    result = supabase_manager.execute_with_retry(get_device_logs)
+    if isinstance(result, dict) and "error" in result:
+        raise LookupError(result["error"])
+    return result
+
+@st.cache_data(ttl=DEVICE_POWER_LOGS_CACHE_TTL_SECONDS, show_spinner=False)
+def _joined_device_power_logs(device_id: int) -> List[Dict[str, Any]]:
+    """Log rows already joined with the customer profile by the get_device_power_logs_with_customer function"""
+    joined = supabase_manager.client.rpc(
+        "get_device_power_logs_with_customer", {"p_device_id": device_id}
+    ).execute().data or []
+    return [_join_customer(entry["device_power_logs"], entry.get("customer_profile")) for entry in joined]
+
+def _join_customer(log_row: Dict[str, Any], customer: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Customer fields added to a log row; log columns win on name clashes"""
+    if not customer:
+        return log_row
+    return {**log_row, **{key: value for key, value in customer.items() if key not in log_row}}
+
+def fetch_device_power_logs_with_customer(device_id: int):
+    """
+    Device power logs joined with the customer profile for the app's device analytics (rows cached per device).
+    
+    Queries go through the shared supabase_manager client.
+    
+    The join runs in Postgres (get_device_power_logs_with_customer, see the setup SQL in app.py)
+    when that function exists. Otherwise the device's power logs and its customer profile are
+    fetched concurrently and joined here.
+    """
+    device_id = extract_device_id(device_id)
+    if device_id is None or supabase_manager is None:
+        return [], "error"
+    
     try:
-        # Use the new tool internally
-        result = get_device_power_data(device_id)
-        
-        if result.get("success"):
-            return result.get("raw_data", []), "direct_query"
-        else:
+        rows = _joined_device_power_logs(device_id)
+        if rows:
+            return rows, "database_function"
+        # Empty: the function's inner join drops devices without a customer profile
+    except PostgrestAPIError as e:
+        if e.code != 'PGRST202':
+            logger.error(f"Error in legacy function: {e}")
             return [], "error"
-            
+        logger.warning("get_device_power_logs_with_customer not found - joining device logs and customer profile client-side")
+    except Exception as e:
+        logger.error(f"Error in legacy function: {e}")
+        return [], "error"
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        logs_future = executor.submit(_device_power_logs, device_id)
+        customer_future = executor.submit(get_customer_device_info, device_id)
+    
+    try:
+        rows = logs_future.result()
     except Exception as e:
         logger.error(f"Error in legacy function: {e}")
         return [], "error"
+    
+    customer = customer_future.result().get("customer_profile")
+    if not customer:
+        return rows, "direct_query"
+    
+    return [_join_customer(row, customer) for row in rows], "joined_query"
 
 # =============================================================================
 # MAIN EXECUTION (for standalone testing)
@@ -1076,10 +1022,13 @@ async def main():
         print(f"✅ {AGENT_NAME} initialized successfully!")
         print("💬 You can now interact with the Dextro IoT assistant. Type 'quit' to exit.\n")
         
+        # stdin is read in the default executor so the loop stays free; queries are awaited directly
+        loop = asyncio.get_running_loop()
+        
         # Interactive loop
         while True:
             try:
-                user_input = input("\n👤 You: ").strip()
+                user_input = (await loop.run_in_executor(None, input, "\n👤 You: ")).strip()
                 
                 if user_input.lower() in ['quit', 'exit', 'q']:
                     print("👋 Goodbye!")
@@ -1089,7 +1038,7 @@ async def main():
                     continue
                 
                 print(f"\n🤖 {AGENT_NAME}: ", end="")
-                response = query_claude_agent(agent, user_input)
+                response = await aquery_claude_agent(agent, user_input)
                 print(response)
                 print("\n" + "-" * 60)
                 
@@ -1113,8 +1062,11 @@ if __name__ == "__main__":
     print("🤖 DEXTRO IOT AGENT WITH CLAUDE ANTHROPIC & SUPABASE")
     print("=" * 60)
     
+    # One event loop for the whole session, closed on the way out
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     try:
-        exit_code = asyncio.run(main())
+        exit_code = loop.run_until_complete(main())
     except KeyboardInterrupt:
         print("\n👋 Application terminated by user")
         exit_code = 0
@@ -1122,5 +1074,7 @@ if __name__ == "__main__":
         print(f"💥 Application crashed: {e}")
         logger.error(f"Application crash: {e}")
         exit_code = 1
+    finally:
+        loop.close()
     
     exit(exit_code)
\ No newline at end of file
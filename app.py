@@ -7,22 +7,42 @@ __version__ = "1.0.0"
 
 import streamlit as st
 import pandas as pd
+import io
 import os
+import re
+import base64
+from typing import Optional
 from supabase import create_client, Client
 
-# Configuration Constants from Streamlit secrets
-SUPABASE_URL = st.secrets["supabase"]["url"]
-SUPABASE_KEY = st.secrets["supabase"]["key"]
-CLAUDE_KEY = st.secrets["anthropic"]["api_key"]
+# Configuration Constants from Streamlit secrets (environment variables as fallback)
+from config import SUPABASE_URL, SUPABASE_KEY, CLAUDE_KEY
+
+# Repeat DataLake button clicks within this window are served from memory
+DATALAKE_CACHE_TTL_SECONDS = 300
+DATALAKE_PAGE_SIZE = 1000
+CSV_EXPORT_CACHE_MAX_ENTRIES = 8
+# Settings tab connection badge; typing in the instructions editor reruns the script per edit
+AGENT_STATUS_CACHE_TTL_SECONDS = 60
+# Chat turns replayed in the UI and to the agent each turn; older turns move to st.session_state.message_archive
+_MAX_HISTORY_MESSAGES = 20
+
+# One pass over each chat response; match.lastgroup names the keyword class found
+_POST_RESPONSE_RE = re.compile(
+    r"(?P<error>error)|(?P<analysis>analysis)|(?P<chart>chart|plot|visuali[sz]e|graph)",
+    re.IGNORECASE
+)
+
+# Shown in the Settings tab system status
+DATALAKE_URL_DISPLAY = f"{SUPABASE_URL[:40]}..."
 
 
 # Import AI modules
 from ai_agent import (
     init_claude_agent, 
-    query_claude_agent, 
-    get_dextro_context,
+    query_claude_agent_stream,
     fetch_device_power_logs_with_customer,
     DEFAULT_ANALYSIS_INSTRUCTIONS,
+    ANALYSIS_TEMPLATES,
     STRANDS_AVAILABLE
 )
 from chart_utils import (
@@ -80,13 +100,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+@st.cache_resource(show_spinner=False)
 def get_logo_base64():
-    """Get the Dextro logo as base64 encoded string"""
+    """Get the Dextro logo as base64 encoded string (read once per process, shared by all sessions)"""
     try:
-        import base64
-        import os
-        
         # Try relative path first (for deployment), then absolute path (for local development)
         logo_paths = [
             "dextro_logo.png",  # Relative path for deployment
@@ -104,17 +121,78 @@ def get_logo_base64():
         st.error(f"Could not load logo: {e}")
         return ""
 
+@st.cache_resource(show_spinner=False)
+def get_logo_html(compact: bool = False) -> str:
+    """Logo <img> markup, built once per process (the base64 payload is large)"""
+    if compact:
+        # Smaller logo to maximize chat space
+        return (
+            '<div style="text-align: center; margin: 5px 0;">'
+            '<img src="data:image/png;base64,{}" style="max-height: 50px; width: auto;" alt="DEXTRO">'
+            '</div>'.format(get_logo_base64())
+        )
+    return (
+        '<div class="dextro-logo-container">'
+        '<img src="data:image/png;base64,{}" class="dextro-logo-img" alt="DEXTRO">'
+        '</div>'.format(get_logo_base64())
+    )
+
 @st.cache_resource
 def init_datalake() -> Client:
     """Initialize connection to Dextro DataLake"""
     return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 
-def fetch_customer_profiles(datalake: Client):
-    """Fetch customer profiles from DataLake"""
+@st.cache_data(ttl=DATALAKE_CACHE_TTL_SECONDS, show_spinner=False)
+def _customer_profiles(_datalake: Client, columns: str = "*") -> pd.DataFrame:
+    """customer_profile table as a DataFrame, cached across reruns and sessions (the client is not hashed)"""
+    frames = []
+    start = 0
+    total = None
+    first_page = True
+    # Page through the table: a single request is capped at the PostgREST max-rows setting.
+    # Each page becomes a small frame right away, so the full list of row dicts is never held.
+    # The first page also asks for the exact row count, so paging stops without a trailing
+    # empty request and still works if the server's max-rows is below DATALAKE_PAGE_SIZE.
+    # Without a count (Content-Range "0-999/*") a short page marks the end, as before.
+    while True:
+        response = _datalake.table("customer_profile")\
+            .select(columns, count="exact" if first_page else None)\
+            .order("Device_id")\
+            .range(start, start + DATALAKE_PAGE_SIZE - 1)\
+            .execute()
+        if first_page:
+            total = response.count
+            first_page = False
+        page = response.data
+        if not page:
+            break
+        frames.append(pd.DataFrame(page))
+        start += len(page)
+        if total is not None:
+            if start >= total:
+                break
+        elif len(page) < DATALAKE_PAGE_SIZE:
+            break
+    
+    if not frames:
+        return pd.DataFrame()
+    # Arrow-backed dtypes: compact strings, and st.dataframe serializes them without converting
+    return pd.concat(frames, ignore_index=True).convert_dtypes(dtype_backend="pyarrow")
+
+
+@st.cache_data(max_entries=CSV_EXPORT_CACHE_MAX_ENTRIES, show_spinner=False)
+def dataframe_to_csv(df: pd.DataFrame) -> bytes:
+    """CSV export of a DataFrame; an unchanged frame is not re-serialized on the next rerun"""
+    csv = io.BytesIO()
+    df.to_csv(csv, index=False, chunksize=DATALAKE_PAGE_SIZE)
+    return csv.getvalue()
+
+
+def fetch_customer_profiles(datalake: Client, columns: str = "*") -> Optional[pd.DataFrame]:
+    """Fetch customer profiles from DataLake (columns: comma-separated projection, all by default)"""
     try:
-        response = datalake.table("customer_profile").select("*").execute()
-        return response.data
+        return _customer_profiles(datalake, columns)
     except Exception as e:
         st.error(f"Error fetching customer profiles: {str(e)}")
         return None
@@ -152,6 +230,118 @@ SELECT
     cp.* 
 FROM public.device_power_logs dpl 
 JOIN public.customer_profile cp ON cp."Device_id" = dpl.device_id;
+        """,
+        "create_location_performance_function": """
+-- Aggregate location/district performance in the database (one row instead of every log)
+CREATE OR REPLACE FUNCTION rpc_location_performance(p_location TEXT DEFAULT NULL, p_district TEXT DEFAULT NULL)
+RETURNS TABLE (
+    total_devices BIGINT,
+    total_water DOUBLE PRECISION,
+    total_energy DOUBLE PRECISION,
+    error_count BIGINT,
+    total_rows BIGINT
+) AS $$
+    SELECT
+        COUNT(DISTINCT dpl.device_id),
+        COALESCE(SUM(dpl."TodayLitre"), 0),
+        COALESCE(SUM(dpl."Power_KWH"), 0),
+        COUNT(*) FILTER (WHERE COALESCE(TRIM(dpl."PumpError"), '') NOT IN ('', '0', '9999', 'NORMAL')),
+        COUNT(*)
+    FROM public.device_power_logs dpl
+    WHERE (p_location IS NULL OR dpl."Location" ILIKE '%' || p_location || '%')
+      AND (p_district IS NULL OR dpl."District" ILIKE '%' || p_district || '%');
+$$ LANGUAGE sql STABLE;
+
+CREATE INDEX IF NOT EXISTS idx_dpl_location_district
+    ON public.device_power_logs ("Location", "District")
+    INCLUDE (device_id, "TodayLitre", "Power_KWH", "PumpError");
+        """,
+        "create_error_summary_function": """
+-- Per-device pump error summary in the database (counts per code instead of every log row)
+CREATE OR REPLACE FUNCTION get_device_error_summary(p_device_id BIGINT)
+RETURNS JSONB AS $$
+    WITH logs AS (
+        SELECT dpl.*, COALESCE(TRIM(dpl."PumpError"), '') AS error_code
+        FROM public.device_power_logs dpl
+        WHERE dpl.device_id = p_device_id
+    ),
+    errors AS (
+        SELECT error_code, COUNT(*) AS occurrences
+        FROM logs
+        WHERE error_code NOT IN ('', '0', '9999', 'NORMAL')
+        GROUP BY error_code
+    )
+    SELECT jsonb_build_object(
+        'total_records', (SELECT COUNT(*) FROM logs),
+        'error_count', COALESCE((SELECT SUM(occurrences) FROM errors), 0),
+        'error_code_counts', COALESCE((SELECT jsonb_object_agg(error_code, occurrences) FROM errors), '{}'::jsonb),
+        'latest_record', (SELECT to_jsonb(l) - 'error_code' FROM logs l ORDER BY l."CreatedOnDate" DESC LIMIT 1)
+    );
+$$ LANGUAGE sql STABLE;
+        """,
+        "create_indexes": """
+-- Indexes backing the agent's device_power_logs reads
+-- Per-device history, newest first (device power data, recent device logs)
+CREATE INDEX IF NOT EXISTS idx_dpl_device_created
+    ON public.device_power_logs (device_id, "CreatedOnDate" DESC);
+
+-- ILIKE '%...%' location/district filters need trigram indexes (btree can't serve a leading wildcard)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_dpl_location_trgm
+    ON public.device_power_logs USING gin ("Location" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_dpl_district_trgm
+    ON public.device_power_logs USING gin ("District" gin_trgm_ops);
+
+-- Date-window filters on the append-mostly log table
+CREATE INDEX IF NOT EXISTS idx_dpl_created_brin
+    ON public.device_power_logs USING brin ("CreatedOnDate");
+
+-- Customer lookups by device (customer info tool)
+CREATE INDEX IF NOT EXISTS ix_customer_profile_device_id
+    ON public.customer_profile ("Device_id");
+        """,
+        "create_catalog_view": """
+-- Distinct device/date pairs, used for suggestions when a device query finds nothing
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.mv_dpl_catalog AS
+SELECT DISTINCT device_id, LEFT("CreatedOnDate", 10) AS log_date
+FROM public.device_power_logs;
+
+CREATE INDEX IF NOT EXISTS idx_mv_dpl_catalog_date ON public.mv_dpl_catalog (log_date DESC);
+
+-- Refresh periodically (e.g. hourly with pg_cron)
+REFRESH MATERIALIZED VIEW public.mv_dpl_catalog;
+        """,
+        "create_ping_function": """
+-- Zero-cost health check used by the RPC connection test
+CREATE OR REPLACE FUNCTION rpc_ping()
+RETURNS INT AS $$
+    SELECT 1;
+$$ LANGUAGE sql IMMUTABLE;
+        """,
+        "create_dashboard_metrics_view": """
+-- Headline metrics for the last 24 hours, read by get_dashboard_snapshot in one SELECT
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.mv_dashboard_metrics AS
+SELECT
+    COUNT(DISTINCT device_id) AS total_devices,
+    COUNT(DISTINCT device_id) FILTER (
+        WHERE COALESCE(TRIM("PumpError"), '') NOT IN ('', '0', '9999', 'NORMAL')
+    ) AS error_devices,
+    COALESCE(SUM("TodayLitre"), 0) AS water_today,
+    COALESCE(SUM("Power_KWH"), 0) AS energy_today_kwh,
+    COALESCE(SUM("TodayLitre") / NULLIF(SUM("Power_KWH"), 0), 0) AS energy_efficiency,
+    mode() WITHIN GROUP (ORDER BY "Location") AS top_location,
+    mode() WITHIN GROUP (ORDER BY "District") AS top_district,
+    now() AS refreshed_at
+FROM public.device_power_logs
+WHERE "CreatedOnDate" >= to_char(now() - interval '1 day', 'YYYY-MM-DD HH24:MI:SS');
+
+-- Refresh every 5 minutes with pg_cron
+CREATE EXTENSION IF NOT EXISTS pg_cron;
+SELECT cron.schedule(
+    'refresh-mv-dashboard-metrics',
+    '*/5 * * * *',
+    'REFRESH MATERIALIZED VIEW public.mv_dashboard_metrics'
+);
         """
     }
 
@@ -160,22 +350,21 @@ def render_chat_tab():
     """Render the Dextro AI Chat tab with proper Streamlit chat interface"""
     
     # Smaller logo to maximize chat space
-    st.markdown(
-        '<div style="text-align: center; margin: 5px 0;">'
-        '<img src="data:image/png;base64,{}" style="max-height: 50px; width: auto;" alt="DEXTRO">'
-        '</div>'.format(get_logo_base64()),
-        unsafe_allow_html=True
-    )
+    st.markdown(get_logo_html(compact=True), unsafe_allow_html=True)
     
     # Check if AI is available
     if not STRANDS_AVAILABLE:
         st.error("❌ AI capabilities not available. Missing dependencies.")
         return
     
-    claude_agent = init_claude_agent(SUPABASE_URL, SUPABASE_KEY, CLAUDE_KEY)
-    if not claude_agent:
-        st.error("❌ Failed to initialize AI agent. Check your configuration.")
-        return
+    # One agent per session: the conversation replayed into it must not be shared between users
+    claude_agent = st.session_state.get("claude_agent")
+    if claude_agent is None:
+        claude_agent = init_claude_agent(SUPABASE_URL, SUPABASE_KEY, CLAUDE_KEY)
+        if not claude_agent:
+            st.error("❌ Failed to initialize AI agent. Check your configuration.")
+            return
+        st.session_state.claude_agent = claude_agent
     
     # Step 1: Initialize chat history
     if "messages" not in st.session_state:
@@ -185,8 +374,10 @@ def render_chat_tab():
                 "content": "Hi! I'm your Dextro AI assistant. I can help you analyze IoT device data, diagnose pump errors, and create visualizations. What would you like to explore?"
             }
         ]
+    if "message_archive" not in st.session_state:
+        st.session_state.message_archive = []
     
-    # Step 2: Display all messages from history
+    # Step 2: Display the recent messages (at most _MAX_HISTORY_MESSAGES)
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
@@ -203,42 +394,39 @@ def render_chat_tab():
         # Display user message in chat message container
         st.chat_message("user").markdown(prompt)
         # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        _append_chat_message({"role": "user", "content": prompt})
 
         # Display assistant response in chat message container
         with st.chat_message("assistant"):
             with st.spinner("🤖 Analyzing your request..."):
-                # Get Dextro context and query agent
-                full_prompt = f"{get_dextro_context()}\n\nUser question: {prompt}"
-                response = query_claude_agent(claude_agent, full_prompt)
-                
-                # Convert response to string if it's an AgentResult object
-                response_text = str(response)
-                
-                # Display the response
-                st.markdown(response_text)
+                # Stream the agent's answer as it is generated; the Dextro context is in the system
+                # prompt and earlier turns are replayed as-is, so both come from the prompt cache.
+                # Only the bounded window is replayed; archived turns are kept for export, not sent.
+                history = st.session_state.messages[:-1]
+                response_text = st.write_stream(query_claude_agent_stream(claude_agent, prompt, history))
                 
                 # Handle visualizations
                 chart_data = None
                 error_analysis = None
+                flags = {match.lastgroup for match in _POST_RESPONSE_RE.finditer(response_text)}
                 
                 if hasattr(st.session_state, 'last_tool_data') and st.session_state.last_tool_data:
                     data = st.session_state.last_tool_data
                     
                     # Try to create appropriate visualizations
-                    if detect_chart_opportunity(response_text, data):
+                    if "chart" in flags or detect_chart_opportunity(response_text, data):
                         if create_device_power_chart(data):
                             chart_data = data
                         elif render_chart_if_data_available(data, "Device Data Analysis"):
                             chart_data = data
                 
                 # Check for error analysis
-                if "error" in response_text.lower() and "analysis" in response_text.lower():
+                if {"error", "analysis"} <= flags:
                     if hasattr(st.session_state, 'last_error_analysis'):
                         error_analysis = st.session_state.last_error_analysis
                         create_error_code_chart(error_analysis)
                 
-                # The metrics display is now handled automatically by query_claude_agent
+                # The metrics display is now handled automatically by query_claude_agent_stream
         
         # Add assistant response to chat history
         message_data = {"role": "assistant", "content": response_text}
@@ -246,16 +434,20 @@ def render_chat_tab():
             message_data["chart_data"] = chart_data
         if error_analysis:
             message_data["error_analysis"] = error_analysis
-        st.session_state.messages.append(message_data)
+        _append_chat_message(message_data)
+
+def _append_chat_message(message: dict) -> None:
+    """Add a chat message, moving the oldest ones to the archive once the replayed window is full"""
+    messages = st.session_state.messages
+    messages.append(message)
+    if len(messages) > _MAX_HISTORY_MESSAGES:
+        overflow = len(messages) - _MAX_HISTORY_MESSAGES
+        st.session_state.message_archive.extend(messages[:overflow])
+        del messages[:overflow]
 
 def render_datalake_tab():
     """Render the Dextro DataLake tab"""
-    st.markdown(
-        '<div class="dextro-logo-container">'
-        '<img src="data:image/png;base64,{}" class="dextro-logo-img" alt="DEXTRO">'
-        '</div>'.format(get_logo_base64()),
-        unsafe_allow_html=True
-    )
+    st.markdown(get_logo_html(), unsafe_allow_html=True)
     st.markdown("### 📊 Explore your IoT device data and customer insights")
     
     datalake = init_datalake()
@@ -275,10 +467,30 @@ def render_datalake_tab():
         st.write("**Option 2: Create a View**")
         st.code(sql_functions["create_view"], language="sql")
         
+        st.write("**Location Performance Aggregation**")
+        st.code(sql_functions["create_location_performance_function"], language="sql")
+        
+        st.write("**Device Error Summary**")
+        st.code(sql_functions["create_error_summary_function"], language="sql")
+        
+        st.write("**Recommended Indexes**")
+        st.code(sql_functions["create_indexes"], language="sql")
+        
+        st.write("**Device Catalog View**")
+        st.code(sql_functions["create_catalog_view"], language="sql")
+        
+        st.write("**RPC Health Check**")
+        st.code(sql_functions["create_ping_function"], language="sql")
+        
+        st.write("**Dashboard Metrics View**")
+        st.code(sql_functions["create_dashboard_metrics_view"], language="sql")
+        
         st.write("**How to set up:**")
-        st.write("1. Go to your DataLake Dashboard")
-        st.write("2. Navigate to SQL Editor")
-        st.write("3. Run either of the SQL commands above")
+        st.markdown(
+            "1. Go to your DataLake Dashboard\n"
+            "2. Navigate to SQL Editor\n"
+            "3. Run either of the SQL commands above"
+        )
     
     # Device Power Logs with Customer Data
     st.markdown("---")
@@ -293,31 +505,32 @@ def render_datalake_tab():
     
     if st.button("📈 Analyze Device Data", type="primary", key="analyze_device_btn"):
         with st.spinner(f"📊 Analyzing device data for ID: {device_id_input}"):
-            joined_data, method = fetch_device_power_logs_with_customer(datalake, int(device_id_input))
+            joined_data, method = fetch_device_power_logs_with_customer(int(device_id_input))
             
             if joined_data:
                 st.success(f"✅ Analysis complete! Found {len(joined_data)} records using {method} method")
                 
-                # Convert to DataFrame for better display
-                df_joined = pd.DataFrame(joined_data)
-                
                 st.subheader("📊 Device Analytics Overview")
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Records Analyzed", len(df_joined))
+                    st.metric("Records Analyzed", len(joined_data))
                 with col2:
-                    st.metric("Data Points", len(df_joined.columns))
+                    # Rows share one shape, so the first row's keys are the columns
+                    st.metric("Data Points", len(joined_data[0]))
                 with col3:
                     st.metric("Analysis Method", method.replace("_", " ").title())
                 
+                # Convert to DataFrame for the table and export only; Arrow-backed dtypes
+                # (int64[pyarrow], string[pyarrow]) go to st.dataframe without another conversion
+                df_joined = pd.DataFrame(joined_data).convert_dtypes(dtype_backend="pyarrow")
+                
                 st.subheader("📋 Comprehensive Device & Customer Data")
                 st.dataframe(df_joined, use_container_width=True, hide_index=True)
                 
                 # Export option
-                csv_joined = df_joined.to_csv(index=False)
                 st.download_button(
                     label="📥 Export Analysis as CSV",
-                    data=csv_joined,
+                    data=dataframe_to_csv(df_joined),
                     file_name=f"dextro_device_{device_id_input}_analysis.csv",
                     mime="text/csv",
                     key="export_analysis_btn"
@@ -330,9 +543,11 @@ def render_datalake_tab():
             else:
                 st.warning(f"No data found for device_id: {device_id_input}")
                 st.info("**Troubleshooting:**")
-                st.write("• Verify the device ID exists in your device logs")
-                st.write("• Check if there's matching customer profile data")
-                st.write("• Ensure both tables contain data")
+                st.markdown(
+                    "- Verify the device ID exists in your device logs\n"
+                    "- Check if there's matching customer profile data\n"
+                    "- Ensure both tables contain data"
+                )
     
     # Customer Profiles Section
     st.markdown("---")
@@ -340,12 +555,10 @@ def render_datalake_tab():
     
     if st.button("📋 View All Customer Profiles", key="view_customers_btn"):
         with st.spinner("📊 Loading customer profiles..."):
-            data = fetch_customer_profiles(datalake)
+            df = fetch_customer_profiles(datalake)
             
-            if data:
-                st.success(f"✅ Loaded {len(data)} customer profiles")
-                
-                df = pd.DataFrame(data)
+            if df is not None and not df.empty:
+                st.success(f"✅ Loaded {len(df)} customer profiles")
                 
                 st.subheader("📊 Customer Overview")
                 col1, col2, col3 = st.columns(3)
@@ -361,10 +574,9 @@ def render_datalake_tab():
                 st.dataframe(df, use_container_width=True, hide_index=True)
                 
                 # Export option
-                csv = df.to_csv(index=False)
                 st.download_button(
                     label="📥 Export Customer Data",
-                    data=csv,
+                    data=dataframe_to_csv(df),
                     file_name="dextro_customer_profiles.csv",
                     mime="text/csv",
                     key="export_customers_btn"
@@ -372,19 +584,55 @@ def render_datalake_tab():
             else:
                 st.warning("No customer data found.")
 
+# Settings callbacks run before the rerun a click triggers, so the editor and summary already
+# show the new instructions on that rerun (no extra st.rerun() pass over the whole script)
+def _set_analysis_instructions(instructions: str, message: str):
+    """Replace the analysis instructions and the editor contents"""
+    st.session_state.analysis_instructions = instructions
+    st.session_state.analysis_instructions_editor = instructions
+    st.toast(message)
+
+
+def _save_analysis_instructions():
+    """Save button callback: store the editor contents"""
+    instructions = st.session_state.analysis_instructions_editor.strip()
+    if instructions:
+        _set_analysis_instructions(instructions, "✅ Analysis instructions saved successfully!")
+    else:
+        st.toast("Instructions cannot be empty")
+
+
+def _import_analysis_instructions():
+    """File uploader callback: load instructions from the uploaded .txt file once, on upload"""
+    uploaded_file = st.session_state.import_instructions
+    if uploaded_file is None:
+        return
+    try:
+        imported_instructions = uploaded_file.getvalue().decode("utf-8")
+        if imported_instructions.strip():
+            _set_analysis_instructions(imported_instructions.strip(), "✅ Instructions imported successfully!")
+        else:
+            st.toast("Imported file is empty")
+    except Exception as e:
+        st.toast(f"Error importing instructions: {str(e)}")
+
+
+@st.cache_data(ttl=AGENT_STATUS_CACHE_TTL_SECONDS, show_spinner=False)
+def claude_agent_status() -> bool:
+    """Whether the AI agent initializes; probed at most once a minute rather than on every rerun"""
+    return init_claude_agent(SUPABASE_URL, SUPABASE_KEY, CLAUDE_KEY) is not None
+
+
 def render_settings_tab():
     """Render the Settings tab for configuring analysis instructions"""
-    st.markdown(
-        '<div class="dextro-logo-container">'
-        '<img src="data:image/png;base64,{}" class="dextro-logo-img" alt="DEXTRO">'
-        '</div>'.format(get_logo_base64()),
-        unsafe_allow_html=True
-    )
+    st.markdown(get_logo_html(), unsafe_allow_html=True)
     st.markdown("### ⚙️ Configure AI Analysis Instructions")
     
     # Initialize session state for analysis instructions
     if "analysis_instructions" not in st.session_state:
         st.session_state.analysis_instructions = DEFAULT_ANALYSIS_INSTRUCTIONS
+    if "analysis_instructions_editor" not in st.session_state:
+        st.session_state.analysis_instructions_editor = st.session_state.analysis_instructions
     
     st.info("Configure custom instructions that the AI agent will use when analyzing device data and error codes. These instructions work alongside the system prompts to provide contextual analysis.")
     
@@ -395,9 +643,8 @@ def render_settings_tab():
     st.markdown("**Current Analysis Instructions:**")
     
     # Text area for editing instructions
-    updated_instructions = st.text_area(
+    st.text_area(
         "Edit Analysis Instructions",
-        value=st.session_state.analysis_instructions,
         height=300,
         help="These instructions guide how the AI analyzes your IoT device data, error codes, and operational patterns.",
         key="analysis_instructions_editor"
@@ -407,19 +654,14 @@ def render_settings_tab():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("💾 Save Instructions", type="primary"):
-            if updated_instructions.strip():
-                st.session_state.analysis_instructions = updated_instructions.strip()
-                st.success("✅ Analysis instructions saved successfully!")
-                st.rerun()
-            else:
-                st.error("Instructions cannot be empty")
+        st.button("💾 Save Instructions", type="primary", on_click=_save_analysis_instructions)
     
     with col2:
-        if st.button("🔄 Reset to Defaults"):
-            st.session_state.analysis_instructions = DEFAULT_ANALYSIS_INSTRUCTIONS
-            st.success("✅ Reset to default instructions")
-            st.rerun()
+        st.button(
+            "🔄 Reset to Defaults",
+            on_click=_set_analysis_instructions,
+            args=(DEFAULT_ANALYSIS_INSTRUCTIONS, "✅ Reset to default instructions")
+        )
     
     with col3:
         if st.button("📋 Copy Instructions"):
@@ -429,86 +671,22 @@ def render_settings_tab():
     st.markdown("---")
     st.subheader("💡 Instruction Templates")
     
-    templates = {
-        "Maintenance-Focused": """
-Focus on preventive maintenance and operational efficiency:
-
-ANALYSIS PRIORITIES:
-- Identify patterns that indicate upcoming maintenance needs
-- Prioritize cost-effective maintenance scheduling
-- Consider equipment lifecycle and replacement planning
-- Factor in seasonal operational demands
-
-ERROR ASSESSMENT:
-- Evaluate error frequency and operational impact
-- Distinguish between critical failures and minor issues
-- Consider maintenance history when making recommendations
-- Assess urgency based on safety and operational continuity
-
-REPORTING STYLE:
-- Provide clear maintenance schedules and action items
-- Include cost-benefit analysis for major recommendations
-- Present technical findings in maintenance-friendly language
-        """,
-        
-        "Performance Optimization": """
-Optimize system performance and energy efficiency:
-
-ANALYSIS APPROACH:
-- Focus on power consumption patterns and efficiency metrics
-- Identify opportunities for energy savings
-- Monitor performance degradation trends
-- Analyze operational patterns for optimization opportunities
-
-EFFICIENCY METRICS:
-- Track power consumption vs. output performance
-- Monitor temperature and voltage stability
-- Assess pump runtime efficiency
-- Identify peak performance operating conditions
-
-RECOMMENDATIONS:
-- Prioritize energy-saving opportunities
-- Suggest operational parameter adjustments
-- Recommend performance monitoring strategies
-        """,
-        
-        "Safety-Critical": """
-Prioritize safety and regulatory compliance:
-
-SAFETY FIRST APPROACH:
-- Identify any conditions that could pose safety risks
-- Prioritize critical errors that could lead to equipment failure
-- Monitor environmental conditions that affect safe operation
-- Assess compliance with safety standards
-
-RISK ASSESSMENT:
-- Categorize risks by potential impact and probability
-- Consider cascading failure scenarios
-- Evaluate emergency response requirements
-- Monitor safety system performance
-
-COMPLIANCE FOCUS:
-- Ensure recommendations align with safety regulations
-- Document safety-critical findings thoroughly
-- Prioritize immediate action items for safety issues
-        """
-    }
-    
     selected_template = st.selectbox(
         "Choose a template to replace current instructions:",
-        ["Select a template..."] + list(templates.keys()),
+        ["Select a template..."] + list(ANALYSIS_TEMPLATES),
         key="template_selector"
     )
     
     if selected_template and selected_template != "Select a template...":
-        if st.button(f"📝 Apply {selected_template} Template"):
-            st.session_state.analysis_instructions = templates[selected_template].strip()
-            st.success(f"✅ Applied {selected_template} template")
-            st.rerun()
+        st.button(
+            f"📝 Apply {selected_template} Template",
+            on_click=_set_analysis_instructions,
+            args=(ANALYSIS_TEMPLATES[selected_template].strip(), f"✅ Applied {selected_template} template")
+        )
         
         # Show preview of selected template
         with st.expander(f"Preview: {selected_template} Template"):
-            st.code(templates[selected_template], language="text")
+            st.code(ANALYSIS_TEMPLATES[selected_template], language="text")
     
     # Export/Import functionality
     st.markdown("---")
@@ -525,18 +703,12 @@ COMPLIANCE FOCUS:
         )
     
     with col2:
-        uploaded_file = st.file_uploader("📤 Import Instructions", type="txt", key="import_instructions")
-        if uploaded_file is not None:
-            try:
-                imported_instructions = uploaded_file.read().decode("utf-8")
-                if imported_instructions.strip():
-                    st.session_state.analysis_instructions = imported_instructions.strip()
-                    st.success("✅ Instructions imported successfully!")
-                    st.rerun()
-                else:
-                    st.error("Imported file is empty")
-            except Exception as e:
-                st.error(f"Error importing instructions: {str(e)}")
+        st.file_uploader(
+            "📤 Import Instructions",
+            type="txt",
+            key="import_instructions",
+            on_change=_import_analysis_instructions
+        )
     
     # Show current configuration summary
     st.subheader("📊 Configuration Summary")
@@ -560,39 +732,45 @@ COMPLIANCE FOCUS:
     
     col1, col2 = st.columns(2)
     
+    # One element per status box; markdown hard line breaks ("  \n") keep one item per line
     with col1:
-        st.info(f"**DataLake:** Connected ✅")
-        st.info("**DataLake API Key:** Configured ✅")
-        st.info(f"**DataLake URL:** {SUPABASE_URL[:40]}...")
+        st.info(
+            "**DataLake:** Connected ✅  \n"
+            "**DataLake API Key:** Configured ✅  \n"
+            f"**DataLake URL:** {DATALAKE_URL_DISPLAY}"
+        )
         
     with col2:
-        st.info("**AI Agent:** Configured ✅")
+        ok_lines = ["**AI Agent:** Configured ✅"]
+        error_lines = []
         if STRANDS_AVAILABLE:
-            st.info("**Strands SDK:** Available ✅")
+            ok_lines.append("**Strands SDK:** Available ✅")
         else:
-            st.error("**Strands SDK:** Not installed ❌")
-            st.code("pip install 'strands-agents[anthropic]'")
+            error_lines.append("**Strands SDK:** Not installed ❌")
         
-        claude_agent = init_claude_agent(SUPABASE_URL, SUPABASE_KEY, CLAUDE_KEY)
-        if claude_agent:
-            st.info("**Claude Model:** Connected ✅")
+        if claude_agent_status():
+            ok_lines.append("**Claude Model:** Connected ✅")
         else:
-            st.error("**Claude Model:** Connection failed ❌")
+            error_lines.append("**Claude Model:** Connection failed ❌")
+        
+        st.info("  \n".join(ok_lines))
+        if error_lines:
+            st.error("  \n".join(error_lines))
+        if not STRANDS_AVAILABLE:
+            st.code("pip install 'strands-agents[anthropic]'")
 
 def main():
     """Main application entry point"""
     
-    # Create tabs
-    tab1, tab2, tab3 = st.tabs(["🤖 Dextro AI Chat", "📊 Dextro DataLake", "⚙️ Settings"])
-    
-    with tab1:
-        render_chat_tab()
-    
-    with tab2:
-        render_datalake_tab()
-        
-    with tab3:
-        render_settings_tab()
+    # Tab-style view switcher. Unlike st.tabs, which runs every tab body on each rerun,
+    # only the selected view is rendered (no agent init or DataLake work for hidden tabs)
+    views = {
+        "🤖 Dextro AI Chat": render_chat_tab,
+        "📊 Dextro DataLake": render_datalake_tab,
+        "⚙️ Settings": render_settings_tab,
+    }
+    active_view = st.radio("View", list(views), horizontal=True, key="active_tab", label_visibility="collapsed")
+    views[active_view]()
     
 
 if __name__ == "__main__":
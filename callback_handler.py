@@ -3,16 +3,28 @@
 Callback handler for capturing model outputs and tool results
 """
 
-import json
 import time
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, NamedTuple
 from datetime import datetime
+import orjson
 import streamlit as st
 
 logger = logging.getLogger(__name__)
 
 
+def _dumps(obj: Any) -> str:
+    """Serialize event payloads for the console log (orjson is several times faster than json)"""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+
+
+class TokenUsage(NamedTuple):
+    """Token counts for one agent query (tuple-backed: no per-instance dict)"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+
+
 class CaptureCallbackHandler:
     """Callback handler that captures model outputs and sends them to Streamlit console."""
 
@@ -24,6 +36,16 @@ class CaptureCallbackHandler:
         self.assistant_messages = []
         self.token_usage = None
 
+    def reset(self) -> None:
+        """Start a new query with fresh per-query state.
+        
+        Lists are rebound rather than cleared, so results already handed to session state stay intact.
+        """
+        self.pending_token_metadata = None
+        self.tool_results = []
+        self.assistant_messages = []
+        self.token_usage = None
+
     def __call__(self, **kwargs: Any) -> None:
         """Process callback events and send to Streamlit."""
         if not self.request_id:
@@ -66,13 +88,13 @@ class CaptureCallbackHandler:
             "latencyMs": metrics.get("latencyMs")
         }
         
-        self.token_usage = {
-            "input_tokens": usage.get("inputTokens", 0),
-            "output_tokens": usage.get("outputTokens", 0),
-            "total_tokens": usage.get("totalTokens", 0)
-        }
+        self.token_usage = TokenUsage(
+            usage.get("inputTokens", 0),
+            usage.get("outputTokens", 0),
+            usage.get("totalTokens", 0)
+        )
 
-        self._log_to_streamlit(f"📊 Token Metadata: {json.dumps(self.pending_token_metadata)}")
+        self._log_to_streamlit(f"📊 Token Metadata: {_dumps(self.pending_token_metadata)}")
 
     def _process_assistant_message(self, message: Dict[str, Any], timestamp: int) -> None:
         """Process assistant messages."""
@@ -89,9 +111,9 @@ class CaptureCallbackHandler:
 
         self._log_to_streamlit(f"🤖 Assistant Message (Sequence {self.sequence_counter})")
         self._log_to_streamlit(f"   Timestamp: {timestamp}")
-        self._log_to_streamlit(f"   Content: {json.dumps(content)}")
+        self._log_to_streamlit(f"   Content: {_dumps(content)}")
         if self.pending_token_metadata:
-            self._log_to_streamlit(f"   Token Metadata: {json.dumps(self.pending_token_metadata)}")
+            self._log_to_streamlit(f"   Token Metadata: {_dumps(self.pending_token_metadata)}")
         self.pending_token_metadata = None
 
     def _process_tool_result(self, message: Dict[str, Any], timestamp: int) -> None:
@@ -132,10 +154,10 @@ class CaptureCallbackHandler:
             self._log_to_streamlit(f"   Timestamp: {timestamp}")
             self._log_to_streamlit(f"   Tool Use ID: {tool_result.get('toolUseId', '')}")
             if tool_input:
-                self._log_to_streamlit(f"   Input/Query: {json.dumps(tool_input)}")
-            self._log_to_streamlit(f"   Output: {json.dumps(tool_result.get('content', []))}")
+                self._log_to_streamlit(f"   Input/Query: {_dumps(tool_input)}")
+            self._log_to_streamlit(f"   Output: {_dumps(tool_result.get('content', []))}")
             if self.pending_token_metadata:
-                self._log_to_streamlit(f"   Token Metadata: {json.dumps(self.pending_token_metadata)}")
+                self._log_to_streamlit(f"   Token Metadata: {_dumps(self.pending_token_metadata)}")
         self.pending_token_metadata = None
 
     def _process_final_result(self, result: Any, timestamp: int) -> None:
@@ -146,11 +168,12 @@ class CaptureCallbackHandler:
         self._log_to_streamlit(f"   Timestamp: {timestamp}")
         self._log_to_streamlit(f"   Result: {str(result)}")
         if self.pending_token_metadata:
-            self._log_to_streamlit(f"   Token Metadata: {json.dumps(self.pending_token_metadata)}")
+            self._log_to_streamlit(f"   Token Metadata: {_dumps(self.pending_token_metadata)}")
         self.pending_token_metadata = None
 
     def _log_to_streamlit(self, message: str) -> None:
         """Send log message to Streamlit console."""
+        logger.debug("Console: %s", message)
         try:
             if hasattr(st, 'session_state'):
                 if 'agent_console_logs' not in st.session_state:
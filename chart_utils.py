@@ -3,9 +3,18 @@ Chart and Visualization Utilities for Dextro Platform
 Handles chart generation and data visualization for LLM responses
 """
 
+import re
 import streamlit as st
 import pandas as pd
 
+# Figures kept for recent distinct datasets (chat history replays them on every rerun)
+CHART_CACHE_MAX_ENTRIES = 32
+
+_CHART_KEYWORDS_RE = re.compile(
+    "chart|graph|plot|visualize|data|analysis|trend|distribution|comparison|statistics|metrics|summary",
+    re.IGNORECASE
+)
+
 def render_chart_if_data_available(data, chart_title="Data Visualization"):
     """Create charts if data is available in the response"""
     try:
@@ -48,48 +57,60 @@ def render_chart_if_data_available(data, chart_title="Data Visualization"):
     
     return False
 
+@st.cache_resource(max_entries=CHART_CACHE_MAX_ENTRIES, show_spinner=False)
+def _error_code_figures(error_analysis):
+    """Plotly figures for an error analysis, built once and reused when chat history is replayed"""
+    import plotly.express as px
+    
+    figures = {}
+    
+    # Error code frequency chart
+    error_breakdown = error_analysis.get("error_breakdown", {})
+    if error_breakdown:
+        error_codes = list(error_breakdown.keys())
+        error_counts = [error_breakdown[code]["count"] for code in error_codes]
+        
+        figures["frequency"] = px.bar(
+            x=error_codes, 
+            y=error_counts,
+            title="Error Code Frequency",
+            labels={'x': 'Error Code', 'y': 'Count'}
+        )
+    
+    # Severity pie chart
+    severity_summary = error_analysis.get("severity_summary", {})
+    # Filter out zero values
+    filtered_severity = {k: v for k, v in severity_summary.items() if v > 0}
+    if filtered_severity:
+        figures["severity"] = px.pie(
+            values=list(filtered_severity.values()),
+            names=list(filtered_severity.keys()),
+            title="Error Severity Distribution"
+        )
+    
+    return figures
+
 def create_error_code_chart(error_analysis):
     """Create specialized charts for pump error code analysis"""
     try:
-        import plotly.express as px
-        import plotly.graph_objects as go
-        
         if not error_analysis or not isinstance(error_analysis, dict):
             return False
         
+        figures = _error_code_figures(error_analysis)
+        severity_summary = error_analysis.get("severity_summary", {})
+        
         st.subheader("📊 Pump Error Analysis")
         
         # Create tabs for different visualizations
         tab1, tab2, tab3 = st.tabs(["🔴 Error Distribution", "⚠️ Severity Analysis", "📋 Summary"])
         
         with tab1:
-            # Error code frequency chart
-            error_breakdown = error_analysis.get("error_breakdown", {})
-            if error_breakdown:
-                error_codes = list(error_breakdown.keys())
-                error_counts = [error_breakdown[code]["count"] for code in error_codes]
-                
-                fig = px.bar(
-                    x=error_codes, 
-                    y=error_counts,
-                    title="Error Code Frequency",
-                    labels={'x': 'Error Code', 'y': 'Count'}
-                )
-                st.plotly_chart(fig, use_container_width=True)
+            if "frequency" in figures:
+                st.plotly_chart(figures["frequency"], use_container_width=True)
         
         with tab2:
-            # Severity pie chart
-            severity_summary = error_analysis.get("severity_summary", {})
-            if severity_summary:
-                # Filter out zero values
-                filtered_severity = {k: v for k, v in severity_summary.items() if v > 0}
-                if filtered_severity:
-                    fig = px.pie(
-                        values=list(filtered_severity.values()),
-                        names=list(filtered_severity.keys()),
-                        title="Error Severity Distribution"
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+            if "severity" in figures:
+                st.plotly_chart(figures["severity"], use_container_width=True)
         
         with tab3:
             # Summary metrics
@@ -120,32 +141,92 @@ def create_error_code_chart(error_analysis):
 
 def detect_chart_opportunity(response_text, tool_data=None):
     """Detect if the LLM response contains data that could be visualized"""
-    chart_keywords = [
-        "chart", "graph", "plot", "visualize", "data", "analysis", "trend",
-        "distribution", "comparison", "statistics", "metrics", "summary"
-    ]
-    
-    # Check if response mentions visualization
-    response_lower = response_text.lower()
-    has_chart_keywords = any(keyword in response_lower for keyword in chart_keywords)
+    # Check if response mentions visualization (one regex pass, no lower-cased copy of the text)
+    has_chart_keywords = _CHART_KEYWORDS_RE.search(response_text) is not None
     
     # Check if we have actual data to visualize
     has_data = tool_data and isinstance(tool_data, (list, dict)) and len(tool_data) > 0
     
     return has_chart_keywords or has_data
 
+@st.cache_resource(max_entries=CHART_CACHE_MAX_ENTRIES, show_spinner=False)
+def _device_power_figures(device_data):
+    """
+    DataFrame-derived figures and stats for device records, built once per distinct data.
+    
+    Chat history replays the same records on every rerun; they are served from here
+    instead of rebuilding the DataFrame and the Plotly figures each time.
+    """
+    import plotly.express as px
+    
+    df = pd.DataFrame(device_data)
+    if df.empty:
+        return None
+    
+    charts = {"power_trends": [], "error_timeline": None}
+    
+    # Power consumption over time
+    if 'created_on_date' in df.columns:
+        # Extract numeric power values
+        if 'power' in df.columns:
+            power_numeric = pd.to_numeric(
+                df['power'].astype(str).str.replace('W', '').str.replace(',', ''),
+                errors='coerce'
+            )
+            df['power_numeric'] = power_numeric
+            
+            charts["power_trends"].append(px.line(
+                df, 
+                x='created_on_date', 
+                y='power_numeric',
+                title="Power Consumption Over Time",
+                labels={'power_numeric': 'Power (W)', 'created_on_date': 'Time'}
+            ))
+        
+        # Voltage and current if available
+        for metric in ['voltage', 'current']:
+            if metric in df.columns:
+                numeric_values = pd.to_numeric(df[metric], errors='coerce')
+                if not numeric_values.isna().all():
+                    charts["power_trends"].append(px.line(
+                        df, 
+                        x='created_on_date', 
+                        y=metric,
+                        title=f"{metric.title()} Over Time"
+                    ))
+    
+    # Error code timeline
+    has_pump_error = 'pump_error' in df.columns
+    charts["has_error_timeline"] = has_pump_error and 'created_on_date' in df.columns
+    if charts["has_error_timeline"]:
+        error_timeline = df[df['pump_error'] != 'NORMAL']
+        
+        if not error_timeline.empty:
+            charts["error_timeline"] = px.scatter(
+                error_timeline,
+                x='created_on_date',
+                y='pump_error',
+                title="Error Events Timeline",
+                labels={'pump_error': 'Error Code', 'created_on_date': 'Time'}
+            )
+    
+    # Summary statistics
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    charts["summary"] = df[numeric_cols].describe() if len(numeric_cols) > 0 else None
+    charts["total_records"] = len(df)
+    charts["error_count"] = int((df['pump_error'] != 'NORMAL').sum()) if has_pump_error else 0
+    charts["completeness"] = (1 - df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100
+    return charts
+
 def create_device_power_chart(device_data):
     """Create specialized charts for device power data"""
     try:
-        import plotly.express as px
-        import plotly.graph_objects as go
-        
         if not device_data or not isinstance(device_data, list):
             return False
         
-        df = pd.DataFrame(device_data)
+        charts = _device_power_figures(device_data)
         
-        if df.empty:
+        if charts is None:
             return False
         
         st.subheader("📊 Device Power Analysis")
@@ -154,75 +235,31 @@ def create_device_power_chart(device_data):
         tab1, tab2, tab3 = st.tabs(["⚡ Power Trends", "🔧 Error Timeline", "📈 Metrics"])
         
         with tab1:
-            # Power consumption over time
-            if 'created_on_date' in df.columns:
-                # Extract numeric power values
-                if 'power' in df.columns:
-                    power_numeric = pd.to_numeric(
-                        df['power'].astype(str).str.replace('W', '').str.replace(',', ''),
-                        errors='coerce'
-                    )
-                    df['power_numeric'] = power_numeric
-                    
-                    fig = px.line(
-                        df, 
-                        x='created_on_date', 
-                        y='power_numeric',
-                        title="Power Consumption Over Time",
-                        labels={'power_numeric': 'Power (W)', 'created_on_date': 'Time'}
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                
-                # Voltage and current if available
-                for metric in ['voltage', 'current']:
-                    if metric in df.columns:
-                        numeric_values = pd.to_numeric(df[metric], errors='coerce')
-                        if not numeric_values.isna().all():
-                            fig = px.line(
-                                df, 
-                                x='created_on_date', 
-                                y=metric,
-                                title=f"{metric.title()} Over Time"
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
+            for fig in charts["power_trends"]:
+                st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
-            # Error code timeline
-            if 'pump_error' in df.columns and 'created_on_date' in df.columns:
-                error_timeline = df[df['pump_error'] != 'NORMAL'].copy() if 'pump_error' in df.columns else df
-                
-                if not error_timeline.empty:
-                    fig = px.scatter(
-                        error_timeline,
-                        x='created_on_date',
-                        y='pump_error',
-                        title="Error Events Timeline",
-                        labels={'pump_error': 'Error Code', 'created_on_date': 'Time'}
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("No error events found in the data")
+            if charts["error_timeline"] is not None:
+                st.plotly_chart(charts["error_timeline"], use_container_width=True)
+            elif charts["has_error_timeline"]:
+                st.info("No error events found in the data")
         
         with tab3:
-            # Summary statistics
-            numeric_cols = df.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
+            if charts["summary"] is not None:
                 st.write("**Statistical Summary:**")
-                st.dataframe(df[numeric_cols].describe(), use_container_width=True)
+                st.dataframe(charts["summary"], use_container_width=True)
             
             # Data quality metrics
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total Records", len(df))
+                st.metric("Total Records", charts["total_records"])
             with col2:
-                error_count = len(df[df['pump_error'] != 'NORMAL']) if 'pump_error' in df.columns else 0
-                st.metric("Error Events", error_count)
+                st.metric("Error Events", charts["error_count"])
             with col3:
-                completeness = (1 - df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100
-                st.metric("Data Completeness", f"{completeness:.1f}%")
+                st.metric("Data Completeness", f"{charts['completeness']:.1f}%")
         
         return True
         
     except Exception as e:
         st.info(f"Device power chart creation skipped: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Configuration for the Dextro platform
+Reads Streamlit secrets when available and falls back to environment variables.
+Values are resolved and validated once, on first access.
+"""
+
+import os
+import sys
+import types
+import logging
+from functools import lru_cache
+from typing import Any, Final, Mapping
+
+__all__ = [
+    "CFG",
+    "SUPABASE_URL",
+    "SUPABASE_KEY",
+    "CLAUDE_KEY",
+    "CLAUDE_MODEL",
+    "TEMPERATURE",
+    "MAX_TOKENS",
+    "env_bool",
+    "env_str",
+]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLAUDE_MODEL: Final[str] = "claude-3-7-sonnet-20250219"
+DEFAULT_TEMPERATURE: Final[float] = 0.3
+DEFAULT_MAX_TOKENS: Final[int] = 3000
+
+# Upper-case module attributes served from CFG
+_CONFIG_ALIASES = frozenset({"SUPABASE_URL", "SUPABASE_KEY", "CLAUDE_KEY", "CLAUDE_MODEL", "TEMPERATURE", "MAX_TOKENS"})
+
+# Read-only copy of the environment taken at import; config values never drift mid-run
+_ENV_SNAPSHOT: Mapping[str, str] = types.MappingProxyType(dict(os.environ))
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """Boolean environment flag: values starting with 1, t/T or y/Y ("1", "true", "Yes") are True"""
+    value = _ENV_SNAPSHOT.get(name)
+    if not value:
+        return default
+    return value[0] in "1tTyY"
+
+
+def env_str(name: str, default: str = "") -> str:
+    """String environment setting from the import-time snapshot; unset or empty gives the default"""
+    return _ENV_SNAPSHOT.get(name) or default
+
+
+def _parse_temperature(value: Any) -> float:
+    """Sampling temperature, clamped to the range the Anthropic API accepts"""
+    try:
+        temperature = float(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid Claude temperature {value!r}, using {DEFAULT_TEMPERATURE}")
+        return DEFAULT_TEMPERATURE
+    return min(max(temperature, 0.0), 1.0)
+
+
+def _parse_max_tokens(value: Any) -> int:
+    """Response token cap; must be a positive integer"""
+    try:
+        max_tokens = int(value)
+    except (TypeError, ValueError):
+        max_tokens = 0
+    if max_tokens < 1:
+        logger.warning(f"Invalid Claude max_tokens {value!r}, using {DEFAULT_MAX_TOKENS}")
+        return DEFAULT_MAX_TOKENS
+    return max_tokens
+
+
+@lru_cache(maxsize=1)
+def _load_config() -> Mapping[str, Any]:
+    """Resolve and validate every configuration value once, on first access"""
+    try:
+        # Load from Streamlit secrets if available
+        import streamlit as st
+        supabase = st.secrets["supabase"]
+        anthropic = st.secrets["anthropic"]
+        claude = st.secrets["claude"]
+        config = {
+            "supabase_url": supabase["url"],
+            "supabase_key": supabase["key"],
+            "claude_key": anthropic["api_key"],
+            "claude_model": claude["model"],
+            "temperature": claude["temperature"],
+            "max_tokens": claude["max_tokens"],
+        }
+    except (ImportError, KeyError, AttributeError, FileNotFoundError):
+        # Fallback to environment variables for non-Streamlit contexts
+        # (FileNotFoundError: newer Streamlit raises it when secrets.toml is missing)
+        config = {
+            "supabase_url": _ENV_SNAPSHOT.get("SUPABASE_URL", ""),
+            "supabase_key": _ENV_SNAPSHOT.get("SUPABASE_KEY", ""),
+            "claude_key": _ENV_SNAPSHOT.get("CLAUDE_API_KEY", ""),
+            "claude_model": _ENV_SNAPSHOT.get("CLAUDE_MODEL", DEFAULT_CLAUDE_MODEL),
+            "temperature": _ENV_SNAPSHOT.get("CLAUDE_TEMPERATURE", DEFAULT_TEMPERATURE),
+            "max_tokens": _ENV_SNAPSHOT.get("CLAUDE_MAX_TOKENS", DEFAULT_MAX_TOKENS),
+        }
+    
+    # Short identifiers compared and hashed repeatedly (model ids, URLs) are interned
+    for name in ("supabase_url", "claude_model"):
+        config[name] = sys.intern(str(config[name]))
+    
+    # Validated here once so request-building code can use the values as-is
+    config["temperature"] = _parse_temperature(config["temperature"])
+    config["max_tokens"] = _parse_max_tokens(config["max_tokens"])
+    return types.MappingProxyType(config)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Module-level attribute access (PEP 562), so values load lazily.
+    
+    CFG is the read-only mapping of every value (CFG["claude_model"]); the upper-case
+    names (config.SUPABASE_URL etc.) are aliases kept for existing imports.
+    """
+    if name == "CFG":
+        return _load_config()
+    if name in _CONFIG_ALIASES:
+        return _load_config()[name.lower()]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")